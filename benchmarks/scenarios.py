@@ -0,0 +1,203 @@
+"""Scripted game scenarios, timed phase by phase.
+
+Each scenario plays headlessly from a fixed seed at the fixed timestep and
+reports milliseconds of CPU per simulated second for the physics
+(``space.step``), syncing the grid from the blocks, clearing lines and
+drawing every step to an offscreen surface:
+
+    empty     an empty board, the falling piece held at the top
+    stack     19 settled rows of 171 blocks (one gap per row so none clear)
+    cascade   an I piece dropped into four rows that are full but for one
+              column, so they clear and the ragged stack above falls, once
+              a second
+    shaking   100 blocks shaken on every step, as if the mouse never stops
+    speed     the bot playing at level 21, where pieces fall every 100ms
+
+Results are saved as JSON so a later run can be compared with them.  Run
+from the repository root:
+
+    python -m benchmarks.scenarios --output before.json
+    ...change something...
+    python -m benchmarks.scenarios --compare before.json
+"""
+import argparse
+import json
+import math
+import platform
+import time
+
+import pymunk
+
+from physics_tetris import Block, Command, Game, Tetromino
+from physics_tetris.bot import Bot
+from physics_tetris.constants import COLORS, GRID_HEIGHT, GRID_WIDTH, HEIGHT, TIMESTEP, WIDTH
+from physics_tetris.profiler import Profiler
+
+from .snapshot import filled_game
+
+SEED = 0
+
+# Reported phase -> Profiler phase
+PHASES = {"physics": "space_step", "grid_sync": "grid_sync", "clear_lines": "clear_lines", "render": "render"}
+
+
+def hold_piece(game):
+    # Keep the falling piece at the top so it never locks
+    game.fall_speed = float("inf")
+
+
+def empty(seed):
+    game = Game(seed=seed, timestep=TIMESTEP)
+    hold_piece(game)
+    return game, None
+
+
+def stack(seed):
+    game = filled_game(171, seed)
+    hold_piece(game)
+    return game, None
+
+
+def cascade(seed):
+    game = Game(seed=seed, timestep=TIMESTEP)
+    for y in range(GRID_HEIGHT - 10, GRID_HEIGHT):
+        for x in range(GRID_WIDTH - 1):
+            # Four full rows but for the last column, ragged rows above them
+            if y >= GRID_HEIGHT - 4 or x != y % (GRID_WIDTH - 1):
+                block_type = (x + y) % 7 + 1
+                game.add_block(Block(game.space, (x, y), COLORS[block_type], block_type))
+    hold_piece(game)
+    for _ in range(120):
+        game.step()
+    snapshot = game.snapshot()
+
+    def drive(game, step):
+        if step % 60 == 0:
+            game.restore(snapshot)
+            game.current_tetromino = Tetromino.from_state((1, 0, GRID_WIDTH - 1, 1))  # upright I
+            game.hard_drop()
+    return game, drive
+
+
+def shaking(seed):
+    game = filled_game(100, seed)
+    hold_piece(game)
+
+    def drive(game, step):
+        angle = step * 0.3
+        game.apply_command(Command.SHAKE, 4 * math.cos(angle), 2 * math.sin(angle))
+    return game, drive
+
+
+def speed(seed):
+    def level_up(game):
+        game.lines_cleared = 200
+        game.level = 21
+        game.fall_speed = 100
+
+    game = Game(seed=seed, timestep=TIMESTEP)
+    level_up(game)
+    bot = Bot()
+
+    def drive(game, step):
+        if game.game_over:
+            game.apply_command(Command.RESTART)
+            level_up(game)
+        bot.update(game, wait=True)
+    return game, drive
+
+
+SCENARIOS = {"empty": empty, "stack": stack, "cascade": cascade, "shaking": shaking, "speed": speed}
+
+
+def run(scenario, seconds, renderer=None, surface=None):
+    # Milliseconds per simulated second for each reported phase
+    game, drive = scenario(SEED)
+    profiler = Profiler()
+    game.profiler = profiler
+    steps = round(seconds * 1000 / game.timestep)
+    for step in range(steps):
+        if drive is not None:
+            drive(game, step)
+        game.step()
+        if renderer is not None:
+            profiler.mark()
+            renderer.draw(surface, game)
+            profiler.lap("render")
+    simulated = steps * game.timestep / 1000
+    return {name: profiler.phases[phase] * 1000 / simulated for name, phase in PHASES.items()}
+
+
+def best_of(scenario, seconds, repeat, renderer=None, surface=None):
+    # The fastest of several runs, phase by phase
+    runs = [run(scenario, seconds, renderer, surface) for _ in range(repeat)]
+    return {name: min(result[name] for result in runs) for name in PHASES}
+
+
+def print_results(results, baseline=None):
+    print(f"{'scenario':<10}" + "".join(f"{name:>14}" for name in (*PHASES, "total")))
+    for scenario, result in results.items():
+        values = {**result, "total": sum(result.values())}
+        line = f"{scenario:<10}"
+        for name, value in values.items():
+            old = baseline.get(scenario) if baseline else None
+            if old is None:
+                line += f"{value:>14.2f}"
+            else:
+                old_value = sum(old.values()) if name == "total" else old.get(name, 0)
+                change = f"{(value - old_value) / old_value:+.0%}" if old_value else ""
+                line += f"{value:>8.2f}{change:>6}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time scripted Physics Tetris scenarios")
+    parser.add_argument("scenarios", nargs="*", metavar="SCENARIO",
+                        help=f"scenarios to run ({', '.join(SCENARIOS)}; default all)")
+    parser.add_argument("--seconds", type=float, default=20, help="simulated seconds per run")
+    parser.add_argument("--repeat", type=int, default=3, help="runs to take the best of")
+    parser.add_argument("--no-render", action="store_true", help="skip drawing to an offscreen surface")
+    parser.add_argument("--output", help="save the results to this JSON file")
+    parser.add_argument("--compare", metavar="PATH", help="show changes against results saved with --output")
+    args = parser.parse_args()
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario {name!r}")
+    scenarios = args.scenarios or list(SCENARIOS)
+
+    renderer = surface = None
+    if not args.no_render:
+        # Drawing to a plain surface needs fonts but no display
+        import pygame
+        from physics_tetris.render import Renderer
+
+        pygame.font.init()
+        renderer = Renderer()
+        surface = pygame.Surface((WIDTH, HEIGHT))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+
+    print(f"ms per simulated second, best of {args.repeat} runs of {args.seconds:g}s")
+    results = {name: best_of(SCENARIOS[name], args.seconds, args.repeat, renderer, surface)
+               for name in scenarios}
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "pymunk": pymunk.version,
+                "seed": SEED,
+                "timestep": TIMESTEP,
+                "seconds": args.seconds,
+                "render": renderer is not None,
+                "results": results,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Cost of Game.snapshot() and Game.restore() against the number of blocks.
+
+Fills the board from the floor up with settled blocks (one gap per row so
+nothing clears, at most 171 blocks in 19 rows) and times saving and restoring the state, with a deep copy
+of the whole game as the baseline.  Run from the repository root:
+
+    python -m benchmarks.snapshot
+"""
+import argparse
+import copy
+import timeit
+
+from physics_tetris import Block, Game
+from physics_tetris.constants import COLORS, GRID_HEIGHT, GRID_WIDTH
+
+
+def filled_game(block_count, seed=0):
+    game = Game(seed=seed)
+    cells = [(x, y) for y in range(GRID_HEIGHT - 1, -1, -1) for x in range(GRID_WIDTH)
+             if x != y % GRID_WIDTH]
+    for x, y in cells[:block_count]:
+        block_type = (x + y) % 7 + 1
+        game.add_block(Block(game.space, (x, y), COLORS[block_type], block_type))
+
+    # Let the stack settle so some of it is asleep, like a real board.  The
+    # falling piece is held in place so it cannot lock into the gaps.
+    fall_speed, game.fall_speed = game.fall_speed, float("inf")
+    for _ in range(120):
+        game.step()
+    game.fall_speed = fall_speed
+    return game
+
+
+def best_of(statement, number, repeat):
+    return min(timeit.repeat(statement, number=number, repeat=repeat)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark game snapshots")
+    parser.add_argument("--counts", type=int, nargs="+", default=[0, 20, 50, 100, 150, 171])
+    parser.add_argument("--number", type=int, default=50, help="calls per timing")
+    parser.add_argument("--repeat", type=int, default=5, help="timings to take the best of")
+    args = parser.parse_args()
+
+    print(f"{'blocks':>6} {'snapshot ms':>12} {'restore ms':>11} {'deepcopy ms':>12}")
+    for count in args.counts:
+        game = filled_game(count)
+        snapshot = game.snapshot()
+        save = best_of(game.snapshot, args.number, args.repeat)
+        restore = best_of(lambda: game.restore(snapshot), args.number, args.repeat)
+        deep = best_of(lambda: copy.deepcopy(game), max(1, args.number // 10), args.repeat)
+        print(f"{len(game.blocks):>6} {save * 1000:>12.3f} {restore * 1000:>11.3f} {deep * 1000:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
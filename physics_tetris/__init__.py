@@ -0,0 +1,10 @@
+"""Physics Tetris.
+
+The simulation in ``physics_tetris.core`` is headless; drawing lives in
+``physics_tetris.render`` and is only imported by front ends that need it.
+"""
+from .constants import *  # noqa: F401,F403
+from .core import (  # noqa: F401
+    SHAKE_PROFILES, Block, Command, Game, Snapshot, Tetromino, create_segment, create_space,
+)
+from .multiboard import MultiBoard  # noqa: F401
@@ -0,0 +1,107 @@
+"""Occupancy grid helpers.
+
+A grid is either the classic list of row lists or, when numpy is installed
+and ``Game(use_numpy=True)`` is asked for, a ``(GRID_HEIGHT, GRID_WIDTH)``
+int8 array.  Both are indexed ``grid[y][x]`` and hold the tetromino type of
+the block in that cell (0 for empty).  With an array, full-row detection,
+row collapsing and collision checks are each one vectorized operation.
+
+The helpers above the ``batch_*`` functions take a single grid.  The
+``batch_*`` functions work on a stack of boards with shape
+``(boards, GRID_HEIGHT, GRID_WIDTH)``, made with ``stack_boards``, for
+bots, replays and analytics.
+"""
+from .constants import GRID_HEIGHT, GRID_WIDTH
+
+# numpy is optional and slow to import, so it is only loaded once a numpy
+# board is asked for; until then no grid can be an array
+np = None
+
+
+def load_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise RuntimeError("the numpy board needs numpy installed (pip install numpy)") from None
+        np = numpy
+    return np
+
+
+def new_grid(use_numpy=False):
+    if use_numpy:
+        np = load_numpy()
+        return np.zeros((GRID_HEIGHT, GRID_WIDTH), dtype=np.int8)
+    return [[0 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
+
+
+def is_array(grid):
+    return np is not None and isinstance(grid, np.ndarray)
+
+
+def full_rows(grid):
+    # Indices of every row with no empty cell, top to bottom
+    if is_array(grid):
+        return np.flatnonzero(grid.all(axis=1)).tolist()
+    return [y for y, row in enumerate(grid) if all(cell != 0 for cell in row)]
+
+
+def collapse_rows(grid, rows):
+    # Drop the given rows and add as many empty rows at the top
+    if is_array(grid):
+        collapsed = np.zeros_like(grid)
+        collapsed[len(rows):] = np.delete(grid, rows, axis=0)
+        return collapsed
+    cleared = set(rows)
+    return ([[0 for _ in range(GRID_WIDTH)] for _ in rows] +
+            [row for y, row in enumerate(grid) if y not in cleared])
+
+
+def fits(grid, cells):
+    # True if a piece covering cells stays between the walls, above the floor and
+    # off other blocks.  Cells above the top of the grid are allowed.
+    if is_array(grid):
+        xs, ys = np.asarray(cells).T
+        if (xs < 0).any() or (xs >= GRID_WIDTH).any() or (ys >= GRID_HEIGHT).any():
+            return False
+        visible = ys >= 0
+        return not grid[ys[visible], xs[visible]].any()
+    for x, y in cells:
+        if (x < 0 or x >= GRID_WIDTH or
+            y >= GRID_HEIGHT or
+            (y >= 0 and grid[y][x] != 0)):
+            return False
+    return True
+
+
+def stack_boards(grids):
+    # Stack grids of either kind into one (boards, height, width) array
+    np = load_numpy()
+    return np.stack([np.asarray(grid, dtype=np.int8) for grid in grids])
+
+
+def batch_full_rows(boards):
+    # (boards, height) mask of full rows
+    return (boards != 0).all(axis=2)
+
+
+def batch_lines(boards):
+    # Number of full rows on each board
+    return batch_full_rows(boards).sum(axis=1)
+
+
+def batch_column_heights(boards):
+    # Height of the highest occupied cell in every column, 0 for an empty column
+    np = load_numpy()
+    occupied = boards != 0
+    first = occupied.argmax(axis=1)
+    return np.where(occupied.any(axis=1), GRID_HEIGHT - first, 0)
+
+
+def batch_holes(boards):
+    # Empty cells with an occupied cell somewhere above them in the same column
+    np = load_numpy()
+    occupied = boards != 0
+    covered = np.maximum.accumulate(occupied, axis=1)
+    return (covered & ~occupied).sum(axis=(1, 2))
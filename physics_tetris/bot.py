@@ -0,0 +1,252 @@
+"""Placement-search autoplayer, for load testing and attract mode.
+
+For the falling piece, the bot tries every rotation and column it can reach,
+drops the piece onto the occupancy bitmasks that ``update_grid_from_blocks``
+keeps (``Game.row_masks``) and scores the board left behind.  With
+lookahead on, each placement is scored by the best placement of the next
+piece on top of it.  Candidates can be fanned out over a process pool, and
+the best few can be checked with a short physics rollout that penalises
+placements that topple once the blocks start to move.
+
+The bot plays through ``Game.apply_command``, one command at a time, just
+like the keyboard:
+
+    bot = Bot(workers=4)
+    while True:
+        bot.update(game)
+        game.update(16)
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from . import pieces
+from .constants import GRID_HEIGHT, GRID_WIDTH
+from .core import Command
+
+# Board weights, from the well-known four-feature heuristic
+HEIGHT_WEIGHT = -0.510066
+LINES_WEIGHT = 0.760666
+HOLES_WEIGHT = -0.35663
+BUMPINESS_WEIGHT = -0.184483
+
+TOPPLE_WEIGHT = -0.5  # per cell that changed while a rollout settled
+
+SPAWN_X = GRID_WIDTH // 2  # where Tetromino places a new piece
+SPAWN_Y = 1
+
+
+def landing_row(row_masks, tetromino_type, rotation, x, y):
+    # Lowest row a piece that fits at y can fall to
+    while pieces.fits(row_masks, tetromino_type, rotation, x, y + 1):
+        y += 1
+    return y
+
+
+def place(row_masks, tetromino_type, rotation, x, y):
+    # Row masks after locking the piece at (x, y) and clearing full rows,
+    # and how many rows were cleared
+    min_x, _, rows = pieces.PIECE_ROWS[tetromino_type][rotation]
+    placed = list(row_masks)
+    for dy, bits in rows:
+        if y + dy >= 0:
+            placed[y + dy] |= bits << (x + min_x)
+    kept = [mask for mask in placed if mask != pieces.FULL_ROW]
+    lines = len(placed) - len(kept)
+    return [0] * lines + kept, lines
+
+
+def placements(row_masks, tetromino_type, x, y):
+    # (rotation, x, landing row) for every distinct resting place reachable by
+    # rotating where the piece is and then sliding it sideways
+    found = {}
+    for rotation in range(4):
+        if not pieces.fits(row_masks, tetromino_type, rotation, x, y):
+            continue
+        for step in (-1, 1):
+            column = x if step == 1 else x - 1
+            while pieces.fits(row_masks, tetromino_type, rotation, column, y):
+                landing = landing_row(row_masks, tetromino_type, rotation, column, y)
+                cells = frozenset((column + cx, landing + cy)
+                                  for cx, cy in pieces.ROTATIONS[tetromino_type][rotation])
+                found.setdefault(cells, (rotation, column, landing))
+                column += step
+    return list(found.values())
+
+
+def board_score(row_masks, lines):
+    # Aggregate height, holes and bumpiness in one pass down the rows: a
+    # column's height is set by its first occupied row, and every empty cell
+    # under an occupied one is a hole
+    heights = [0] * GRID_WIDTH
+    holes = 0
+    covered = 0
+    for y, row in enumerate(row_masks):
+        holes += (covered & ~row).bit_count()
+        tops = row & ~covered
+        while tops:
+            bit = tops & -tops
+            heights[bit.bit_length() - 1] = GRID_HEIGHT - y
+            tops ^= bit
+        covered |= row
+    bumpiness = sum(abs(a - b) for a, b in zip(heights, heights[1:]))
+    return (HEIGHT_WEIGHT * sum(heights) + LINES_WEIGHT * lines +
+            HOLES_WEIGHT * holes + BUMPINESS_WEIGHT * bumpiness)
+
+
+def evaluate(row_masks, tetromino_type, next_type, candidates):
+    # Score each (rotation, x, landing row) candidate; with a next piece, by
+    # the best board reachable after placing that too.  Runs in pool workers.
+    results = []
+    for rotation, x, y in candidates:
+        board, lines = place(row_masks, tetromino_type, rotation, x, y)
+        if next_type is None:
+            score = board_score(board, lines)
+        else:
+            score = float("-inf")
+            for next_rotation, next_x, next_y in placements(board, next_type, SPAWN_X, SPAWN_Y):
+                next_board, next_lines = place(board, next_type, next_rotation, next_x, next_y)
+                score = max(score, board_score(next_board, lines + next_lines))
+            if score == float("-inf"):
+                score = board_score(board, lines) - 1000  # the next piece could not spawn
+        results.append((score, rotation, x, y))
+    return results
+
+
+class Bot:
+    def __init__(self, workers=0, lookahead=True, rollouts=0, rollout_steps=45,
+                 commands_per_update=1, restart=False):
+        # workers > 0 evaluates candidates in that many processes.  The pool
+        # starts them on the first plan, when the front end already has SDL
+        # and its threads running, so they are spawned rather than forked.
+        self.pool = None
+        if workers:
+            self.pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+        self.workers = workers
+        self.lookahead = lookahead
+
+        # Re-rank the best `rollouts` placements by simulating rollout_steps
+        # fixed steps after dropping the piece
+        self.rollouts = rollouts
+        self.rollout_steps = rollout_steps
+
+        self.commands_per_update = commands_per_update
+        self.restart = restart  # start a new game after game over, for attract mode
+
+        self.piece = None  # the tetromino the current plan is for
+        self.pending = []  # futures still evaluating candidates for it
+        self.target = None  # (rotation, x) to steer the piece to
+        self.last_state = None
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def start_plan(self, game):
+        tetromino = game.current_tetromino
+        row_masks = tuple(game.row_masks)
+        next_type = game.next_tetromino.type if self.lookahead else None
+        candidates = placements(row_masks, tetromino.type, tetromino.grid_x, tetromino.grid_y)
+
+        self.piece = tetromino
+        self.target = None
+        self.last_state = None
+        if self.pool is None:
+            self.pending = [evaluate(row_masks, tetromino.type, next_type, candidates)]
+        else:
+            chunks = [candidates[i::self.workers] for i in range(self.workers)]
+            self.pending = [self.pool.submit(evaluate, row_masks, tetromino.type, next_type, chunk)
+                            for chunk in chunks if chunk]
+
+    def finish_plan(self, game, wait):
+        if self.pool is not None:
+            if not wait and not all(future.done() for future in self.pending):
+                return False
+            results = [result for future in self.pending for result in future.result()]
+        else:
+            results = self.pending[0]
+        self.pending = []
+        if not results:
+            self.target = (self.piece.rotation, self.piece.grid_x)  # nowhere to go; drop as is
+            return True
+
+        results.sort(reverse=True)
+        if self.rollouts:
+            results = self.roll_out(game, results[:self.rollouts])
+        _, rotation, x, _ = results[0]
+        self.target = (rotation, x)
+        return True
+
+    def roll_out(self, game, results):
+        # Drop each candidate into the real simulation, let it settle and
+        # count the cells that moved, then put the game back as it was
+        if game.recorder is not None:
+            raise ValueError("physics rollouts restore the game, which a replay cannot reproduce")
+        snapshot = game.snapshot()
+        ranked = []
+        for score, rotation, x, y in results:
+            tetromino = game.current_tetromino
+            tetromino.rotation = rotation
+            tetromino.shape_coords = pieces.ROTATIONS[tetromino.type][rotation]
+            tetromino.grid_x = x
+            tetromino.grid_y = y
+            game.hard_drop()
+            settled = list(game.row_masks)
+            for _ in range(self.rollout_steps):
+                if game.game_over:
+                    break
+                game.step()
+            if game.game_over:
+                score = float("-inf")
+            else:
+                moved = sum((a ^ b).bit_count() for a, b in zip(settled, game.row_masks))
+                score += TOPPLE_WEIGHT * moved
+            ranked.append((score, rotation, x, y))
+            game.restore(snapshot)
+
+        # Restoring replaced the piece objects; keep following the same piece
+        self.piece = game.current_tetromino
+        ranked.sort(reverse=True)
+        return ranked
+
+    def next_command(self, game):
+        # One command toward the target, or a hard drop once it is reached or
+        # the last command changed nothing
+        tetromino = game.current_tetromino
+        state = (tetromino.rotation, tetromino.grid_x, tetromino.grid_y)
+        stuck = state == self.last_state
+        self.last_state = state
+
+        rotation, x = self.target
+        if not stuck:
+            if tetromino.rotation != rotation:
+                return Command.ROTATE
+            if tetromino.grid_x < x:
+                return Command.RIGHT
+            if tetromino.grid_x > x:
+                return Command.LEFT
+        return Command.HARD_DROP
+
+    def update(self, game, wait=False):
+        # Call once per frame.  With wait the plan for a new piece is finished
+        # before returning, otherwise the piece waits while workers search.
+        if game.game_over:
+            if self.restart:
+                game.apply_command(Command.RESTART)
+            return
+
+        for _ in range(self.commands_per_update):
+            if game.current_tetromino is not self.piece:
+                self.start_plan(game)
+            if self.target is None and not self.finish_plan(game, wait):
+                return
+            command = self.next_command(game)
+            game.apply_command(command)
+            if command == Command.HARD_DROP or game.game_over:
+                return
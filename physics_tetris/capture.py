@@ -0,0 +1,230 @@
+"""Capture rendered frames to disk without holding up the game.
+
+``FrameCapture.capture(surface)`` copies the surface's pixels straight out
+of its buffer into a free slot of a preallocated ring, with no conversion
+and no allocation, and returns.  Background writer threads turn queued
+slots into a PNG sequence, or append them to a single raw video file, and
+hand the slots back.  When the writers fall behind and the ring is full,
+new frames are dropped rather than waited for, and the number dropped and
+the queue depth are reported on stderr:
+
+    capture = FrameCapture("frames/")      # or "highlights.raw"
+    while True:
+        renderer.draw(screen, game)
+        capture.capture(screen)
+        pygame.display.flip()
+    capture.close()
+
+Any surface works, including the display under the dummy video driver and
+plain offscreen surfaces, so frames of ``Renderer.draw`` can be captured
+headlessly.  A raw file holds the frames back to back in the surface's own
+32-bit pixel layout; the ``.json`` written next to it has the size and the
+matching ffmpeg pixel format:
+
+    ffmpeg -f rawvideo -pix_fmt bgra -s 800x600 -r 60 -i highlights.raw highlights.mp4
+
+``python -m physics_tetris.capture REPLAY OUTPUT`` renders every frame of a
+replay offscreen, for highlight reels and visual regression tests.
+"""
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+import pygame
+
+RING_SIZE = 120  # frames buffered for the writers, two seconds at 60 FPS
+REPORT_INTERVAL = 1.0  # seconds between reports of dropped frames
+
+# Colour masks of a 32-bit surface -> ffmpeg's name for its byte order
+PIXEL_FORMATS = {
+    (0xFF0000, 0xFF00, 0xFF): "bgra",
+    (0xFF, 0xFF00, 0xFF0000): "rgba",
+    (0xFF00, 0xFF0000, 0xFF000000): "argb",
+    (0xFF000000, 0xFF0000, 0xFF00): "abgr",
+}
+
+
+class FrameCapture:
+    """Copies frames into a ring buffer that writer threads save from.
+
+    ``path`` ending in ``.raw`` writes raw video; anything else is a
+    directory for ``frame000000.png`` files.  PNG encoding is slow, so
+    several ``writers`` can share the work; raw video needs one, since the
+    frames go into one file in order.
+    """
+
+    def __init__(self, path, ring_size=RING_SIZE, writers=1, fps=60):
+        self.path = path
+        self.raw = path.endswith(".raw")
+        if self.raw and writers != 1:
+            raise ValueError("raw video is written in order by a single writer")
+        self.ring_size = ring_size
+        self.writer_count = writers
+        self.fps = fps
+
+        # Set up from the first frame captured
+        self.size = None
+        self.layout = None  # (bit size, masks, pitch, height) every frame must share
+        self.slots = None  # one bytearray per ring slot
+        self.free = queue.SimpleQueue()  # slot indices the writers are done with
+        self.queued = queue.SimpleQueue()  # (slot, frame) waiting to be written
+        self.writers = []
+        self.file = None
+
+        self.frames = 0  # frames offered to capture()
+        self.written = 0  # counted by every writer, under written_lock
+        self.written_lock = threading.Lock()
+        self.dropped = 0
+        self.reported = (0, 0.0)  # dropped count and time of the last report
+
+    @property
+    def queue_depth(self):
+        return self.queued.qsize()
+
+    @staticmethod
+    def surface_layout(surface):
+        # Everything the pixel buffer's size and meaning depend on
+        return surface.get_bitsize(), surface.get_masks(), surface.get_pitch(), surface.get_height()
+
+    def check(self, surface):
+        # Raise ValueError if frames like surface cannot be saved.  capture()
+        # checks the first frame itself; calling this first lets a program
+        # fail at startup instead of in its frame loop.
+        if not self.raw:
+            return
+        bitsize, masks, pitch, _ = self.surface_layout(surface)
+        if bitsize != 32 or pitch != surface.get_width() * 4:
+            raise ValueError(f"raw video needs a 32-bit surface without row padding, not {bitsize}-bit "
+                             f"with {pitch} bytes per {surface.get_width()} pixel row")
+        if masks[:3] not in PIXEL_FORMATS:
+            raise ValueError("raw video needs a pixel byte order ffmpeg can name, not colour masks "
+                             + ", ".join(f"{mask:#010x}" for mask in masks[:3]))
+
+    def start(self, surface):
+        self.check(surface)
+        self.size = surface.get_size()
+        self.layout = self.surface_layout(surface)
+        frame_bytes = surface.get_pitch() * surface.get_height()
+        self.slots = [bytearray(frame_bytes) for _ in range(self.ring_size)]
+        for slot in range(self.ring_size):
+            self.free.put(slot)
+
+        if self.raw:
+            masks = self.layout[1]
+            self.file = open(self.path, "wb")
+            with open(self.path + ".json", "w") as f:
+                json.dump({"width": self.size[0], "height": self.size[1], "fps": self.fps,
+                           "pix_fmt": PIXEL_FORMATS[masks[:3]]}, f)
+        else:
+            os.makedirs(self.path, exist_ok=True)
+
+        for i in range(self.writer_count):
+            writer = threading.Thread(target=self.write_frames, name=f"capture-{i}", daemon=True)
+            writer.start()
+            self.writers.append(writer)
+
+    def capture(self, surface, wait=False):
+        # Queue a copy of surface; False if it was dropped because every slot
+        # was still waiting to be written.  With wait, block for a slot
+        # instead, for offline rendering where no frame may be lost.
+        if self.slots is None:
+            self.start(surface)
+        elif self.surface_layout(surface) != self.layout:
+            raise ValueError("every captured surface needs the size and pixel format of the first")
+
+        frame = self.frames
+        self.frames += 1
+        try:
+            slot = self.free.get(block=wait)
+        except queue.Empty:
+            self.dropped += 1
+            self.report()
+            return False
+
+        # The buffer proxy locks the surface only for the length of the copy
+        self.slots[slot][:] = memoryview(surface.get_buffer())
+        self.queued.put((slot, frame))
+        return True
+
+    def write_frames(self):
+        bitsize, masks, _, _ = self.layout
+        target = None if self.raw else pygame.Surface(self.size, 0, bitsize, masks)
+        while True:
+            item = self.queued.get()
+            if item is None:
+                return
+            slot, frame = item
+            pixels = self.slots[slot]
+            if self.raw:
+                self.file.write(pixels)
+            else:
+                with memoryview(target.get_buffer()) as view:
+                    view[:] = pixels
+                pygame.image.save(target, os.path.join(self.path, f"frame{frame:06d}.png"))
+            self.free.put(slot)
+            with self.written_lock:
+                self.written += 1
+
+    def report(self, force=False):
+        # Tell how far behind the writers are, at most every REPORT_INTERVAL
+        last_dropped, last_time = self.reported
+        now = time.monotonic()
+        if self.dropped != last_dropped and (force or now - last_time >= REPORT_INTERVAL):
+            print(f"capture: {self.dropped - last_dropped} frames dropped, {self.queue_depth} of "
+                  f"{self.ring_size} waiting to be written", file=sys.stderr)
+            self.reported = (self.dropped, now)
+
+    def close(self):
+        # Write out everything still queued, then stop the writers
+        for _ in self.writers:
+            self.queued.put(None)
+        for writer in self.writers:
+            writer.join()
+        self.writers = []
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.report(force=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main():
+    import argparse
+
+    from .constants import HEIGHT, WIDTH
+    from .render import Renderer
+    from .replay import Player
+
+    parser = argparse.ArgumentParser(description="Render a Physics Tetris replay to image files or raw video")
+    parser.add_argument("replay", help="replay file written with --record")
+    parser.add_argument("output", help="directory for PNG frames, or a .raw video file")
+    parser.add_argument("--every", type=int, default=1, metavar="N", help="capture every Nth fixed step")
+    parser.add_argument("--writers", type=int, default=os.cpu_count(), help="PNG writer threads")
+    args = parser.parse_args()
+
+    # Fonts are all the renderer needs; no window is opened
+    pygame.font.init()
+    surface = pygame.Surface((WIDTH, HEIGHT))
+    renderer = Renderer()
+    player = Player.load(args.replay, verify=False)
+    writers = 1 if args.output.endswith(".raw") else args.writers
+
+    start = time.perf_counter()
+    with FrameCapture(args.output, writers=writers, fps=round(1000 / player.replay.timestep / args.every, 3)) as capture:
+        while player.tick < player.replay.length and player.step():
+            if player.tick % args.every == 0:
+                renderer.draw(surface, player.game)
+                capture.capture(surface, wait=True)
+    print(f"{capture.written} frames in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
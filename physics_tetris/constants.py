@@ -0,0 +1,54 @@
+# Constants
+WIDTH, HEIGHT = 800, 600
+BLOCK_SIZE = 30
+GRID_WIDTH = 10
+GRID_HEIGHT = 20
+GRID_OFFSET_X = (WIDTH - GRID_WIDTH * BLOCK_SIZE) // 2
+GRID_OFFSET_Y = 40
+BORDER_WIDTH = 4
+GRAVITY = 500
+SHAKE_FORCE = 2000
+BLOCK_FRICTION = 0.8
+BLOCK_ELASTICITY = 0.1
+BLOCK_BOX = (BLOCK_SIZE - 2, BLOCK_SIZE - 2)  # size of a block's collision box
+BLOCK_POOL_SIZE = GRID_WIDTH * GRID_HEIGHT  # pooled block bodies kept per game, a full board
+SHAKE_DURATION = 100  # milliseconds
+SHAKE_DEAD_ZONE = 0.5  # mouse movement in pixels, per axis, that is too small to shake
+QUAKE_PERIOD = 50  # milliseconds per back-and-forth swing of the "quake" shake profile
+TIMESTEP = 1000 / 60  # milliseconds of simulation per fixed step
+SUBSTEPS = 2  # physics steps per fixed step
+MAX_CATCH_UP_STEPS = 5  # fixed steps run at most per update before dropping time
+SLEEP_TIME_THRESHOLD = 0.5  # seconds a body must stay idle before pymunk puts it to sleep
+FREEZE_AFTER = 2000  # milliseconds a bottom row must stay at rest before it is frozen
+
+# Colors
+BLACK = (0, 0, 0)
+WHITE = (255, 255, 255)
+GRAY = (40, 40, 40)
+DARK_GRAY = (20, 20, 20)
+GRID_COLOR = (50, 50, 50)
+BORDER_COLOR = (100, 100, 100)
+
+# Tetromino colors
+COLORS = [
+    (0, 0, 0),        # Empty
+    (0, 240, 240),    # I - Cyan
+    (0, 0, 240),      # J - Blue
+    (240, 160, 0),    # L - Orange
+    (240, 240, 0),    # O - Yellow
+    (0, 240, 0),      # S - Green
+    (160, 0, 240),    # T - Purple
+    (240, 0, 0)       # Z - Red
+]
+
+# Tetromino shapes (x, y) coordinates
+SHAPES = [
+    [],  # Empty
+    [(0, 0), (0, -1), (0, 1), (0, 2)],      # I
+    [(0, 0), (0, -1), (0, 1), (-1, 1)],     # J
+    [(0, 0), (0, -1), (0, 1), (1, 1)],      # L
+    [(0, 0), (1, 0), (0, 1), (1, 1)],       # O
+    [(0, 0), (1, 0), (0, -1), (-1, -1)],    # S
+    [(0, 0), (-1, 0), (1, 0), (0, 1)],      # T
+    [(0, 0), (-1, 0), (0, -1), (1, -1)]     # Z
+]
@@ -0,0 +1,1036 @@
+"""Headless simulation core.
+
+Nothing in this module touches pygame, so a ``Game`` can be created and
+stepped without a display or an SDL video driver.  Time, input and
+randomness are all passed in explicitly:
+
+    game = Game(seed=1234)
+    game.apply_command(Command.LEFT)
+    game.update(16)
+"""
+import math
+import random
+import weakref
+from enum import IntEnum
+
+import pymunk
+from pymunk import Vec2d
+
+from . import board, pieces
+from .constants import (
+    BLOCK_BOX, BLOCK_ELASTICITY, BLOCK_FRICTION, BLOCK_POOL_SIZE, BLOCK_SIZE, BORDER_WIDTH, COLORS,
+    GRAVITY, GRID_HEIGHT, GRID_OFFSET_X, GRID_OFFSET_Y, GRID_WIDTH, MAX_CATCH_UP_STEPS, QUAKE_PERIOD,
+    SHAKE_DEAD_ZONE, SHAKE_DURATION, SHAKE_FORCE, SLEEP_TIME_THRESHOLD, SUBSTEPS, TIMESTEP,
+)
+
+
+class Command(IntEnum):
+    LEFT = 1
+    RIGHT = 2
+    DOWN = 3
+    ROTATE = 4
+    HARD_DROP = 5
+    PAUSE = 6
+    RESTART = 7
+    TOGGLE_DEBUG = 8
+    SHAKE = 9  # takes the (dx, dy) mouse movement as arguments
+
+
+# Shake profiles: how strongly a shake still pushes, given the milliseconds
+# since it started.  "impulse" is the classic single push.
+SHAKE_PROFILES = {
+    'impulse': lambda elapsed: 0.0,
+    'decay': lambda elapsed: max(0.0, 1 - elapsed / SHAKE_DURATION),
+    'quake': lambda elapsed: (math.cos(2 * math.pi * elapsed / QUAKE_PERIOD) *
+                              max(0.0, 1 - elapsed / SHAKE_DURATION)),
+}
+
+
+def create_space(gravity=GRAVITY):
+    space = pymunk.Space()
+    space.gravity = (0, gravity)
+    # Let settled blocks sleep so a still stack costs next to nothing to step
+    space.sleep_time_threshold = SLEEP_TIME_THRESHOLD
+    return space
+
+
+# Create game borders
+def create_segment(space, p1, p2, thickness=BORDER_WIDTH):
+    body = pymunk.Body(body_type=pymunk.Body.STATIC)
+    shape = pymunk.Segment(body, p1, p2, thickness)
+    shape.elasticity = 0.5
+    shape.friction = 0.9
+    shape.collision_type = 1
+    space.add(body, shape)
+    return shape
+
+
+def create_borders(space):
+    # Create the border of the game area
+    left_wall = create_segment(
+        space,
+        (GRID_OFFSET_X - BORDER_WIDTH, GRID_OFFSET_Y - BORDER_WIDTH),
+        (GRID_OFFSET_X - BORDER_WIDTH, GRID_OFFSET_Y + GRID_HEIGHT * BLOCK_SIZE + BORDER_WIDTH)
+    )
+    right_wall = create_segment(
+        space,
+        (GRID_OFFSET_X + GRID_WIDTH * BLOCK_SIZE + BORDER_WIDTH, GRID_OFFSET_Y - BORDER_WIDTH),
+        (GRID_OFFSET_X + GRID_WIDTH * BLOCK_SIZE + BORDER_WIDTH, GRID_OFFSET_Y + GRID_HEIGHT * BLOCK_SIZE + BORDER_WIDTH)
+    )
+    bottom_wall = create_segment(
+        space,
+        (GRID_OFFSET_X - BORDER_WIDTH, GRID_OFFSET_Y + GRID_HEIGHT * BLOCK_SIZE + BORDER_WIDTH),
+        (GRID_OFFSET_X + GRID_WIDTH * BLOCK_SIZE + BORDER_WIDTH, GRID_OFFSET_Y + GRID_HEIGHT * BLOCK_SIZE + BORDER_WIDTH)
+    )
+    return left_wall, right_wall, bottom_wall
+
+
+def cell_center(pos):
+    # Convert grid position to screen coordinates
+    return Vec2d(GRID_OFFSET_X + pos[0] * BLOCK_SIZE + BLOCK_SIZE // 2,
+                 GRID_OFFSET_Y + pos[1] * BLOCK_SIZE + BLOCK_SIZE // 2)
+
+
+def interpolate_pose(prev_position, prev_angle, position, angle, offset, alpha):
+    # Blend between the previous and current physics state; the pose of the
+    # point at offset from the body's centre
+    position = prev_position + (position - prev_position) * alpha
+    angle = prev_angle + (angle - prev_angle) * alpha
+    return position + offset.rotated(angle), angle
+
+
+def create_block_body(mass=1.0):
+    # The body and box shape of a single-cell block
+    body = pymunk.Body(mass=mass, moment=pymunk.moment_for_box(mass, BLOCK_BOX))
+    return body, pymunk.Poly.create_box(body, BLOCK_BOX)
+
+
+class BlockPool:
+    """Bodies and box shapes of removed single-cell blocks, kept for reuse.
+
+    ``Game`` hands back the pair of every block it clears or restarts away,
+    and new blocks take a pair from here before creating one, so a long
+    session allocates no more pairs than the board ever held at once and
+    leaves no pymunk objects behind for the garbage collector.
+    """
+
+    def __init__(self, size=BLOCK_POOL_SIZE):
+        self.size = size
+        self.free = []  # (body, shape) pairs out of any space
+
+    def __len__(self):
+        return len(self.free)
+
+    def fill(self):
+        # Build pairs up front, so the first games allocate none either
+        while len(self.free) < self.size:
+            self.free.append(create_block_body())
+
+    def acquire(self, position, mass=1.0):
+        # A pair reset to the state of a new one at position, or None when empty
+        if not self.free:
+            return None
+        body, shape = self.free.pop()
+        body.mass = mass
+        body.moment = pymunk.moment_for_box(mass, BLOCK_BOX)
+        body.position = position
+        body.angle = 0
+        # Clears the bias velocity the contact solver left, see Game.restore
+        pymunk.Body.update_position(body, 0)
+        body.velocity = (0, 0)
+        body.angular_velocity = 0
+        body.force = (0, 0)
+        body.torque = 0
+        body.activate()  # forget the idle time it had built up
+        return body, shape
+
+    def release(self, body, shape):
+        if len(self.free) < self.size:
+            self.free.append((body, shape))
+
+
+class Block:
+    __slots__ = ('body', 'shape', 'offset', 'color', 'block_type', 'grid_pos', 'frozen', 'asleep',
+                 'prev_position', 'prev_angle')
+
+    def __init__(self, space, pos, color, block_type, mass=1.0, body=None,
+                 friction=BLOCK_FRICTION, elasticity=BLOCK_ELASTICITY, pool=None):
+        center = cell_center(pos)
+
+        if body is None:
+            # Create the physics body and shape, or reuse a pooled pair
+            parts = pool.acquire(center, mass) if pool is not None else None
+            if parts is None:
+                parts = create_block_body(mass)
+                parts[0].position = center
+            self.body, self.shape = parts
+            self.offset = Vec2d(0, 0)
+        else:
+            # One box of a compound body.  The caller adds the body and all of
+            # its shapes to the space; pymunk derives mass and moment from them.
+            self.body = body
+            self.offset = body.world_to_local(center)
+            half = BLOCK_BOX[0] / 2
+            self.shape = pymunk.Poly(body, [self.offset + corner for corner in
+                                            ((-half, -half), (half, -half), (half, half), (-half, half))])
+            self.shape.mass = mass
+        self.shape.elasticity = elasticity
+        self.shape.friction = friction
+        self.shape.collision_type = 2
+
+        # Add to space
+        if body is None:
+            space.add(self.body, self.shape)
+
+        self.color = color
+        self.block_type = block_type
+        self.grid_pos = None  # Will be updated during game updates
+        self.frozen = False  # True while the body is static geometry
+        self.asleep = False  # body was already asleep at the last grid sync
+
+        # Pose at the start of the current fixed step, for render interpolation
+        self.prev_position = self.body.position
+        self.prev_angle = self.body.angle
+
+    def save_pose(self):
+        self.prev_position = self.body.position
+        self.prev_angle = self.body.angle
+
+    def position(self):
+        # World position of the block's centre
+        return self.body.local_to_world(self.offset)
+
+    def is_resting(self):
+        # Asleep or frozen, so it cannot have moved since the last step
+        return self.frozen or self.body.is_sleeping
+
+    def interpolated_pose(self, alpha):
+        return interpolate_pose(self.prev_position, self.prev_angle, self.body.position,
+                                self.body.angle, self.offset, alpha)
+
+    def compute_grid_position(self):
+        position = self.position()
+        x = int((position.x - GRID_OFFSET_X) / BLOCK_SIZE)
+        y = int((position.y - GRID_OFFSET_Y) / BLOCK_SIZE)
+
+        # Ensure position is within grid bounds
+        x = max(0, min(x, GRID_WIDTH - 1))
+        y = max(0, min(y, GRID_HEIGHT - 1))
+
+        return (x, y)
+
+    def update_grid_position(self):
+        self.grid_pos = self.compute_grid_position()
+        return self.grid_pos
+
+
+class Tetromino:
+    def __init__(self, tetromino_type=None, rng=random):
+        # Select a random tetromino if none specified
+        if tetromino_type is None:
+            tetromino_type = rng.randint(1, 7)
+
+        self.type = tetromino_type
+        self.color = COLORS[tetromino_type]
+        self.blocks = []
+        self.rotation = 0
+        self.shape_coords = pieces.ROTATIONS[tetromino_type][0]
+
+        # Initial position (centered at top)
+        self.grid_x = GRID_WIDTH // 2
+        self.grid_y = 1
+
+        # Physics blocks will be created when the tetromino is locked
+
+    def create_physics_blocks(self, space, compound=False, friction=BLOCK_FRICTION,
+                              elasticity=BLOCK_ELASTICITY, pool=None):
+        if compound:
+            # One rigid body carrying a box shape per cell, centred on the piece
+            cells = self.cells()
+            body = pymunk.Body()
+            body.position = sum((cell_center(cell) for cell in cells), Vec2d(0, 0)) / len(cells)
+            blocks = [Block(space, cell, self.color, self.type, body=body,
+                            friction=friction, elasticity=elasticity) for cell in cells]
+            space.add(body, *(block.shape for block in blocks))
+            return blocks
+
+        blocks = []
+        for coord in self.shape_coords:
+            x = self.grid_x + coord[0]
+            y = self.grid_y + coord[1]
+            block = Block(space, (x, y), self.color, self.type,
+                          friction=friction, elasticity=elasticity, pool=pool)
+            blocks.append(block)
+        return blocks
+
+    def state(self):
+        return self.type, self.rotation, self.grid_x, self.grid_y
+
+    @classmethod
+    def from_state(cls, state):
+        tetromino_type, rotation, grid_x, grid_y = state
+        tetromino = cls(tetromino_type)
+        tetromino.rotation = rotation
+        tetromino.shape_coords = pieces.ROTATIONS[tetromino_type][rotation]
+        tetromino.grid_x = grid_x
+        tetromino.grid_y = grid_y
+        return tetromino
+
+    def cells(self, dx=0, dy=0, shape_coords=None):
+        # Grid cells covered by the piece, optionally offset or in another orientation
+        if shape_coords is None:
+            shape_coords = self.shape_coords
+        return [(self.grid_x + dx + coord[0], self.grid_y + dy + coord[1]) for coord in shape_coords]
+
+    def fits(self, dx, dy, rotation, grid, row_masks=None):
+        # Bitmask check when the game's row masks are available, cell check otherwise
+        if row_masks is not None:
+            return pieces.fits(row_masks, self.type, rotation, self.grid_x + dx, self.grid_y + dy)
+        return board.fits(grid, self.cells(dx, dy, pieces.ROTATIONS[self.type][rotation]))
+
+    def move(self, dx, dy, grid, row_masks=None):
+        # Check if movement is valid
+        if not self.fits(dx, dy, self.rotation, grid, row_masks):
+            return False
+
+        # Move if valid
+        self.grid_x += dx
+        self.grid_y += dy
+        return True
+
+    def rotate(self, grid, row_masks=None):
+        # Rotate 90 degrees clockwise, nudging the piece if it is blocked
+        rotation = (self.rotation + 1) % 4
+        for kick_x, kick_y in pieces.KICKS[self.type]:
+            if self.fits(kick_x, kick_y, rotation, grid, row_masks):
+                self.rotation = rotation
+                self.shape_coords = pieces.ROTATIONS[self.type][rotation]
+                self.grid_x += kick_x
+                self.grid_y += kick_y
+                return True
+
+        return False
+
+
+class Game:
+    def __init__(self, seed=None, rng=None, timestep=TIMESTEP, substeps=SUBSTEPS,
+                 max_steps=MAX_CATCH_UP_STEPS, use_numpy=False, compound_pieces=False,
+                 freeze_after=None, shake_profile='impulse', gravity=GRAVITY,
+                 shake_strength=SHAKE_FORCE, block_friction=BLOCK_FRICTION,
+                 block_elasticity=BLOCK_ELASTICITY):
+        # Pieces are drawn from our own RNG so a seed reproduces a game
+        self.seed = seed
+        self.rng = rng if rng is not None else random.Random(seed)
+
+        # The simulation always advances in fixed steps, whatever the frame rate
+        self.timestep = timestep
+        self.substeps = substeps
+        self.max_steps = max_steps
+
+        # Back the occupancy grid with a numpy array instead of lists
+        self.use_numpy = use_numpy
+
+        # Lock each tetromino as one rigid body instead of four
+        self.compound_pieces = compound_pieces
+
+        # Turn bottom rows that stayed at rest this many milliseconds into
+        # static geometry; None keeps every block dynamic
+        self.freeze_after = freeze_after
+
+        # How a shake plays out over SHAKE_DURATION; see SHAKE_PROFILES
+        self.shake_profile_name = shake_profile
+        self.shake_profile = SHAKE_PROFILES[shake_profile]
+
+        # Physics tuning, the constants by default
+        self.gravity = gravity
+        self.shake_strength = shake_strength  # force per unit of shake movement
+        self.block_friction = block_friction
+        self.block_elasticity = block_elasticity
+
+        # Sees every command and fixed step when set; see replay.Recorder
+        self.recorder = None
+
+        # Times the phases of each step when set; see profiler.Profiler
+        self.profiler = None
+
+        # Bodies and shapes of cleared blocks, reused by new ones.  Nothing is
+        # pooled while a snapshot is alive, since restoring it could put a
+        # pooled pair back on the board.
+        self.block_pool = BlockPool()
+        self.snapshots = weakref.WeakSet()
+
+        self.space = None
+        self.reset()
+
+    def reset(self):
+        if self.space is None:
+            # Every game owns its physics space, so boards never see each other's blocks
+            self.space = create_space(self.gravity)
+            self.watch_wakes(self.space)
+
+            # Create the borders
+            self.left_wall, self.right_wall, self.bottom_wall = create_borders(self.space)
+        else:
+            self.clear_space()
+
+        self.grid = board.new_grid(self.use_numpy)
+        self.row_cells = [{} for _ in range(GRID_HEIGHT)]  # row -> {x: blocks whose centre is in that cell}
+        self.row_masks = [0] * GRID_HEIGHT  # bit x set when cell (x, row) is occupied
+        self.column_masks = [0] * GRID_WIDTH  # bit y set when cell (column, y) is occupied
+        self.blocks = {}  # used as an ordered set so blocks can be removed in O(1)
+        self.body_blocks = {}  # body -> the blocks attached to it
+        self.awake_rows = set()  # rows holding a block that moved in the last step
+        self.awake_blocks = {}  # blocks whose body was awake at the last grid sync, as an ordered set
+        self.wake_check = False  # sleeping bodies may have woken; sync every block once
+        self.row_rest = [0] * GRID_HEIGHT  # milliseconds each row has been at rest
+        self.settled_rows = 0  # rows at the bottom that have rested for freeze_after
+        self.frozen_bodies = {}  # frozen body -> (mass, moment, centre of gravity) to restore
+        self.current_tetromino = Tetromino(rng=self.rng)
+        self.next_tetromino = Tetromino(rng=self.rng)
+        self.game_over = False
+        self.score = 0
+        self.level = 1
+        self.lines_cleared = 0
+        self.fall_time = 0
+        self.fall_speed = 500  # milliseconds
+        self.lock_delay = 500  # milliseconds
+        self.lock_time = 0
+        self.is_locking = False
+        self.shake_time = 0
+        self.shake_force = Vec2d(0, 0)  # force of the current shake, per block
+        self.shake_bodies = []  # (body, force) pairs pushed by the current shake
+        self.sim_time = 0  # milliseconds simulated since the last reset
+        self.ticks = 0  # fixed steps simulated since the last reset
+        self.accumulator = 0  # frame time not yet simulated
+        self.alpha = 0  # how far rendering is between the last two steps
+
+        # Grid for debugging
+        self.debug_grid = False
+
+    def clear_space(self):
+        # Take every block out of the space in one call, shapes before their
+        # bodies, keeping the borders, and pool what can be reused
+        shapes = [block.shape for block in self.blocks]
+        if shapes:
+            self.space.remove(*shapes, *self.body_blocks)
+        for block in self.blocks:
+            if not block.frozen:
+                self.recycle(block)
+
+    def recycle(self, block):
+        # Pool the body and shape of a block that has left the space
+        if not self.compound_pieces and not self.snapshots:
+            self.block_pool.release(block.body, block.shape)
+
+    def apply_shake(self, shake_x, shake_y):
+        # A shake moves the whole board, so its first push reaches every body,
+        # waking the sleeping ones; later pushes only reach those still awake.
+        # The force is built once per shake and scaled by each body's block count.
+        bodies = list(self.body_blocks)
+
+        # Frozen rows take part in a shake like everything else
+        self.thaw_bodies([body for body in bodies if body in self.frozen_bodies])
+
+        self.shake_force = Vec2d(shake_x * self.shake_strength, shake_y * self.shake_strength)
+        forces = {}
+        self.shake_bodies = []
+        for body in bodies:
+            count = len(self.body_blocks[body])
+            if count not in forces:
+                forces[count] = self.shake_force * count
+            self.shake_bodies.append((body, forces[count]))
+            body.apply_force_at_local_point(forces[count], (0, 0))
+
+        self.shake_time = SHAKE_DURATION
+        self.wake_check = True  # pushing a body wakes it
+
+    def continue_shake(self):
+        # Later pushes of a decaying or oscillating shake only reach bodies that
+        # are still awake and still in the game
+        scale = self.shake_profile(SHAKE_DURATION - self.shake_time)
+        if not scale:
+            return
+        for body, force in self.shake_bodies:
+            if not body.is_sleeping and body in self.body_blocks and body not in self.frozen_bodies:
+                body.apply_force_at_local_point(force * scale, (0, 0))
+
+    def bin_block(self, block, cell):
+        # Move a block from its current cell (if any) into cell
+        self.unbin_block(block)
+        block.grid_pos = cell
+        x, y = cell
+        occupants = self.row_cells[y].setdefault(x, [])
+        if not occupants:
+            self.row_masks[y] |= 1 << x
+            self.column_masks[x] |= 1 << y
+        occupants.append(block)
+        self.grid[y][x] = block.block_type
+
+    def unbin_block(self, block):
+        cell = block.grid_pos
+        if cell is None:
+            return
+        x, y = cell
+        occupants = self.row_cells[y][x]
+        occupants.remove(block)
+        if occupants:
+            self.grid[y][x] = occupants[-1].block_type
+        else:
+            del self.row_cells[y][x]
+            self.row_masks[y] &= ~(1 << x)
+            self.column_masks[x] &= ~(1 << y)
+            self.grid[y][x] = 0
+        block.grid_pos = None
+
+    def row_blocks(self, y):
+        # Every block binned in row y
+        return [block for occupants in self.row_cells[y].values() for block in occupants]
+
+    def full_rows(self):
+        if board.is_array(self.grid):
+            return board.full_rows(self.grid)
+        # Rows whose cells are all binned, without scanning the cells
+        return [y for y in range(GRID_HEIGHT) if self.row_masks[y] == pieces.FULL_ROW]
+
+    def watch_wakes(self, space):
+        # A block that starts touching a sleeping one wakes the sleeping body's
+        # whole group, which the grid sync cannot see without checking every block
+        space.on_collision(2, 2, begin=self.contact_begun)
+
+    def contact_begun(self, arbiter, space, data):
+        if not self.wake_check:
+            a, b = arbiter.shapes
+            self.wake_check = a.body.is_sleeping or b.body.is_sleeping
+
+    def update_grid_from_blocks(self):
+        # Only re-bin blocks that can have moved: the ones awake at the last
+        # sync, or every block after something may have woken sleeping bodies.
+        # Sleeping and frozen bodies keep their cell.  A body that fell asleep
+        # during this step still gets one last sync, since it moved before it
+        # went to sleep.
+        blocks = self.blocks if self.wake_check else self.awake_blocks
+        self.wake_check = False
+        awake = {}
+        self.awake_rows.clear()
+        for block in blocks:
+            if block.frozen:
+                continue
+            asleep = block.body.is_sleeping
+            if asleep and block.asleep and block.grid_pos is not None:
+                continue
+            block.asleep = asleep
+            if not asleep:
+                awake[block] = None
+
+            new_pos = block.compute_grid_position()
+            if new_pos != block.grid_pos:
+                self.bin_block(block, new_pos)
+            self.awake_rows.add(new_pos[1])
+        self.awake_blocks = awake
+
+    def set_body_type(self, body, body_type):
+        # Chipmunk keeps a body's contacts when its type changes, and the ones
+        # it kept can outlive the bodies on their other side, leaving pooled
+        # bodies and the space with dangling contacts that hang or crash a
+        # later step.  Taking the shapes out drops their contacts first.
+        shapes = [block.shape for block in self.body_blocks[body]]
+        self.space.remove(*shapes)
+        body.body_type = body_type
+        self.wake_check = True  # removing shapes wakes what they touched
+        return shapes
+
+    def freeze_body(self, body):
+        self.frozen_bodies[body] = (body.mass, body.moment, body.center_of_gravity)
+        body.velocity = (0, 0)
+        body.angular_velocity = 0
+        self.space.add(*self.set_body_type(body, pymunk.Body.STATIC))
+        for block in self.body_blocks[body]:
+            block.frozen = True
+
+    def thaw_bodies(self, bodies):
+        for body in bodies:
+            mass, moment, center_of_gravity = self.frozen_bodies.pop(body)
+            shapes = self.set_body_type(body, pymunk.Body.DYNAMIC)
+            body.mass = mass
+            body.moment = moment
+            body.center_of_gravity = center_of_gravity
+            self.space.add(*shapes)
+            body.activate()
+            for block in self.body_blocks[body]:
+                block.frozen = False
+                block.save_pose()
+
+        # Thawed rows have to settle again before they can refreeze
+        if bodies:
+            self.row_rest = [0] * GRID_HEIGHT
+            self.settled_rows = 0
+
+    def update_frozen_rows(self, dt):
+        # How long each row has gone without a moving block
+        for y in range(GRID_HEIGHT):
+            if not self.row_cells[y] or y in self.awake_rows:
+                self.row_rest[y] = 0
+            else:
+                self.row_rest[y] += dt
+
+        # The settled region grows up from the floor, one resting row at a time
+        settled_rows = 0
+        for y in range(GRID_HEIGHT - 1, -1, -1):
+            if self.row_rest[y] < self.freeze_after:
+                break
+            settled_rows += 1
+
+        if settled_rows > self.settled_rows:
+            # Freeze every body that lies entirely inside the settled region
+            top = GRID_HEIGHT - settled_rows
+            for y in range(top, GRID_HEIGHT):
+                for block in self.row_blocks(y):
+                    if block.frozen:
+                        continue
+                    if all(other.grid_pos[1] >= top for other in self.body_blocks[block.body]):
+                        self.freeze_body(block.body)
+        self.settled_rows = settled_rows
+
+    def update(self, dt):
+        if self.game_over:
+            return
+
+        # Run as many fixed steps as the frame time covers.  After a long hitch
+        # the backlog is capped instead of spiralling into ever longer frames.
+        self.accumulator = min(self.accumulator + dt, self.timestep * self.max_steps)
+        while self.accumulator >= self.timestep and not self.game_over:
+            self.step()
+            self.accumulator -= self.timestep
+
+        self.alpha = self.accumulator / self.timestep
+
+    def step(self):
+        # Advance the simulation by exactly one fixed timestep
+        dt = self.timestep
+        self.sim_time += dt
+        self.ticks += 1
+        profiler = self.profiler
+
+        # Update physics
+        if self.wake_check:
+            for block in self.blocks:
+                if not (block.frozen or block.body.is_sleeping):
+                    block.save_pose()
+        else:
+            for block in self.awake_blocks:
+                block.save_pose()
+        if 0 < self.shake_time < SHAKE_DURATION:
+            self.continue_shake()
+        physics_dt = dt / 1000.0 / self.substeps
+        # pymunk clears forces after every space.step, so a shake's push is set
+        # again before each substep to last the whole fixed step
+        pushes = [(body, body.force) for body, _ in self.shake_bodies if body.force != (0, 0)]
+        if profiler is not None:
+            profiler.mark()
+        for substep in range(self.substeps):
+            if substep:
+                for body, force in pushes:
+                    body.force = force
+            self.space.step(physics_dt)
+        if profiler is not None:
+            profiler.lap('space_step')
+
+        # Update grid based on current block positions
+        self.update_grid_from_blocks()
+        if self.freeze_after is not None:
+            self.update_frozen_rows(dt)
+        if profiler is not None:
+            profiler.lap('grid_sync')
+
+        # Update shake effect
+        if self.shake_time > 0:
+            self.shake_time -= dt
+            if self.shake_time <= 0:
+                self.shake_bodies = []
+
+        # Update tetromino fall
+        self.fall_time += dt
+        if self.fall_time >= self.fall_speed:
+            self.fall_time = 0
+
+            # Try to move tetromino down
+            if not self.current_tetromino.move(0, 1, self.grid, self.row_masks):
+                if not self.is_locking:
+                    self.is_locking = True
+                    self.lock_time = 0
+
+        # Update lock delay
+        if self.is_locking:
+            self.lock_time += dt
+            if self.lock_time >= self.lock_delay:
+                self.lock_tetromino()
+                if profiler is not None:
+                    profiler.mark()
+                self.clear_lines()
+                if profiler is not None:
+                    profiler.lap('clear_lines')
+                self.spawn_tetromino()
+                self.is_locking = False
+
+        if self.recorder is not None:
+            self.recorder.record_step(self)
+
+    def lock_tetromino(self):
+        # Create physics blocks for the tetromino
+        new_blocks = self.current_tetromino.create_physics_blocks(
+            self.space, self.compound_pieces, self.block_friction, self.block_elasticity,
+            self.block_pool)
+
+        # Update grid
+        for block in new_blocks:
+            self.add_block(block)
+
+        # Increase score
+        self.score += 10
+
+    def add_block(self, block):
+        # Track a block that is already in the space and bin it into the grid
+        self.blocks[block] = None
+        self.awake_blocks[block] = None
+        self.body_blocks.setdefault(block.body, []).append(block)
+        self.bin_block(block, block.compute_grid_position())
+
+    def remove_block(self, block):
+        # Detach a block from the game and the space; a body goes with its last block
+        del self.blocks[block]
+        self.awake_blocks.pop(block, None)
+        self.wake_check = True  # removing its shape wakes what it touched
+        block.grid_pos = None
+        if block.frozen:
+            self.thaw_bodies([block.body])
+        body_blocks = self.body_blocks[block.body]
+        body_blocks.remove(block)
+        if body_blocks:
+            self.space.remove(block.shape)
+        else:
+            del self.body_blocks[block.body]
+            self.space.remove(block.shape, block.body)
+            self.recycle(block)
+
+    def split_body(self, body):
+        # Break a compound body whose cells are no longer all connected into
+        # one body per connected group, keeping the same pose and velocity
+        blocks = self.body_blocks[body]
+        origin = blocks[0].offset
+        lattice = {(round((block.offset.x - origin.x) / BLOCK_SIZE),
+                    round((block.offset.y - origin.y) / BLOCK_SIZE)): block
+                   for block in blocks}
+        groups = []
+        unvisited = set(lattice)
+        while unvisited:
+            stack = [min(unvisited)]
+            unvisited.remove(stack[0])
+            group = []
+            while stack:
+                x, y = stack.pop()
+                group.append(lattice[(x, y)])
+                for neighbour in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                    if neighbour in unvisited:
+                        unvisited.remove(neighbour)
+                        stack.append(neighbour)
+            groups.append(group)
+
+        # The first group stays on the original body
+        self.body_blocks[body] = groups[0]
+        for group in groups[1:]:
+            new_body = pymunk.Body()
+            new_body.position = body.position
+            new_body.angle = body.angle
+            new_body.velocity = body.velocity
+            new_body.angular_velocity = body.angular_velocity
+
+            shapes = [block.shape for block in group]
+            self.space.remove(*shapes)
+            for block in group:
+                block.shape.body = new_body
+                block.body = new_body
+                block.save_pose()
+            self.space.add(new_body, *shapes)
+            self.body_blocks[new_body] = group
+
+    def clear_lines(self):
+        # First check which rows are full
+        full_rows = self.full_rows()
+
+        if not full_rows:
+            return  # No full rows
+
+        lines_cleared = len(full_rows)
+
+        # Frozen bodies in or above the cleared rows have to fall again
+        lowest_row = full_rows[-1]
+        self.thaw_bodies([body for body in self.frozen_bodies
+                          if any(block.grid_pos[1] <= lowest_row for block in self.body_blocks[body])])
+
+        # Remove blocks in full rows (block cells are kept current by update_grid_from_blocks)
+        touched_bodies = {}
+        for row_y in full_rows:
+            for block in self.row_blocks(row_y):
+                self.remove_block(block)
+                touched_bodies[block.body] = None
+
+        # Pieces that lost some of their cells may now be in several parts
+        for body in touched_bodies:
+            if len(self.body_blocks.get(body, ())) > 1:
+                self.split_body(body)
+
+        # Collapse the grid and the row index together; rows below the lowest
+        # full row stay where they are
+        cleared = set(full_rows)
+        self.grid = board.collapse_rows(self.grid, full_rows)
+        self.row_cells = ([{} for _ in full_rows] +
+                          [cells for y, cells in enumerate(self.row_cells) if y not in cleared])
+        self.row_masks = ([0 for _ in full_rows] +
+                          [mask for y, mask in enumerate(self.row_masks) if y not in cleared])
+        self.column_masks = [sum(1 << y for y, mask in enumerate(self.row_masks) if mask >> x & 1)
+                             for x in range(GRID_WIDTH)]
+
+        # Apply gravity on blocks above removed rows.  Every block on a body
+        # normally drops by the same amount; if a tilted piece straddles rows
+        # that drop differently, the whole body moves by the smallest drop.
+        moved = []
+        body_drops = {}
+        for y in range(full_rows[-1] + 1):
+            for block in self.row_blocks(y):
+                x, old_y = block.grid_pos
+                block.grid_pos = (x, y)
+                moved.append(block)
+                drop = y - old_y
+                body_drops[block.body] = min(drop, body_drops.get(block.body, drop))
+
+        for body, drop in body_drops.items():
+            body.position += (0, drop * BLOCK_SIZE)
+            for block in self.body_blocks[body]:
+                block.save_pose()  # Don't interpolate across the jump
+
+        if self.compound_pieces:
+            for block in moved:
+                cell = block.compute_grid_position()
+                if cell != block.grid_pos:
+                    self.bin_block(block, cell)
+
+        # Update score and level
+        points = [0, 40, 100, 300, 1200][min(lines_cleared, 4)] * self.level
+        self.score += points
+        self.lines_cleared += lines_cleared
+
+        # Level up every 10 lines
+        self.level = self.lines_cleared // 10 + 1
+
+        # Increase fall speed with level
+        self.fall_speed = max(100, 500 - (self.level - 1) * 20)
+
+    def spawn_tetromino(self):
+        self.current_tetromino = self.next_tetromino
+        self.next_tetromino = Tetromino(rng=self.rng)
+
+        # Check if game over (collision on spawn)
+        tetromino = self.current_tetromino
+        if pieces.overlaps(self.row_masks, tetromino.type, tetromino.rotation,
+                           tetromino.grid_x, tetromino.grid_y):
+            self.game_over = True
+
+    def snapshot(self):
+        # Save the complete state; see Snapshot
+        return Snapshot(self)
+
+    def restore(self, snapshot):
+        # Put the game back into a state saved by snapshot().  The saved walls,
+        # bodies and shapes move into a fresh space, added in their saved
+        # order, so stepping on from a snapshot gives the same result however
+        # the game got here.  A reused space would not: its collision index
+        # and contact caches remember what happened since the snapshot.
+        if snapshot.game is not self:
+            raise ValueError("a snapshot can only be restored into the game that took it")
+
+        shapes = [entry[0].shape for entry in snapshot.blocks]
+        bodies = [entry[0] for entry in snapshot.bodies]
+
+        # Take everything out of the space it is in now.  Shapes that were in
+        # a space which has since been freed are out already, but pymunk
+        # unhooked them from their body and they need attaching again.
+        leaving = {}
+        detached = set()
+        for item in shapes + list(snapshot.walls) + bodies + list(snapshot.wall_bodies):
+            if item.space is not None:
+                leaving.setdefault(item.space, []).append(item)
+            elif isinstance(item, pymunk.Shape):
+                detached.add(item)
+        for old_space, items in leaving.items():
+            old_space.remove(*items)
+
+        space = create_space(self.gravity)
+        self.watch_wakes(space)
+        for wall, body in zip(snapshot.walls, snapshot.wall_bodies):
+            if wall in detached:
+                wall.body = body
+            space.add(body, wall)
+        self.space = space
+        self.left_wall, self.right_wall, self.bottom_wall = snapshot.walls
+
+        # Poses go in before the shapes are added, since the collision index
+        # sizes each shape's box from its body's position and velocity
+        for (body, frozen, mass_info, position, angle, velocity, angular_velocity,
+             force, torque, _) in snapshot.bodies:
+            if frozen != (body.body_type == pymunk.Body.STATIC):
+                if frozen:
+                    body.body_type = pymunk.Body.STATIC
+                else:
+                    body.body_type = pymunk.Body.DYNAMIC
+                    body.mass, body.moment, body.center_of_gravity = mass_info
+            body.position = position
+            body.angle = angle
+            if not frozen:
+                # A zero-length position update clears the bias velocity the
+                # contact solver leaves for the next step, which pymunk does
+                # not otherwise expose
+                pymunk.Body.update_position(body, 0)
+                body.velocity = velocity
+                body.angular_velocity = angular_velocity
+                body.force = force
+                body.torque = torque
+        for block, body, *_ in snapshot.blocks:
+            if block.shape.body is not body or block.shape in detached:
+                block.shape.body = body
+            block.body = body
+        space.add(*bodies, *shapes)
+
+        # Adding its shapes recomputes a compound body's centre of gravity,
+        # which can move its position by a rounding error, so set it again.
+        # Waking every other body also resets the idle time it had built up.
+        for body, frozen, _, position, *_, sleeping in snapshot.bodies:
+            if frozen:
+                continue
+            body.position = position
+            if sleeping:
+                body.sleep()
+            else:
+                body.activate()
+
+        for block, _, grid_pos, frozen, asleep, prev_position, prev_angle in snapshot.blocks:
+            block.grid_pos = grid_pos
+            block.frozen = frozen
+            block.asleep = asleep
+            block.prev_position = prev_position
+            block.prev_angle = prev_angle
+
+        self.blocks = dict.fromkeys(entry[0] for entry in snapshot.blocks)
+        self.body_blocks = {body: list(blocks) for body, blocks in snapshot.body_blocks.items()}
+        self.frozen_bodies = dict(snapshot.frozen_bodies)
+        self.shake_bodies = list(snapshot.shake_bodies)
+        self.grid = snapshot.grid.copy() if board.is_array(snapshot.grid) else [row[:] for row in snapshot.grid]
+        self.row_cells = [{x: list(occupants) for x, occupants in cells.items()} for cells in snapshot.row_cells]
+        self.row_masks = list(snapshot.row_masks)
+        self.column_masks = list(snapshot.column_masks)
+        self.row_rest = list(snapshot.row_rest)
+        self.awake_rows = set(snapshot.awake_rows)
+        self.awake_blocks = {}
+        self.wake_check = True
+        self.current_tetromino, self.next_tetromino = (
+            Tetromino.from_state(state) for state in snapshot.tetrominoes)
+        self.rng.setstate(snapshot.rng_state)
+        self.__dict__.update(snapshot.values)
+
+    def hard_drop(self):
+        # Landing row straight from the column masks, instead of one row at a time
+        tetromino = self.current_tetromino
+        distance = pieces.drop_distance(self.column_masks, tetromino.type, tetromino.rotation,
+                                        tetromino.grid_x, tetromino.grid_y)
+        tetromino.grid_y += distance
+        self.score += 2 * distance
+        self.lock_tetromino()
+        if self.profiler is not None:
+            self.profiler.mark()
+        self.clear_lines()
+        if self.profiler is not None:
+            self.profiler.lap('clear_lines')
+        self.spawn_tetromino()
+
+    def apply_command(self, command, *args):
+        # The mouse sends a shake every frame it is held; ones too small to
+        # push anything are dropped before they reach a recording
+        if command == Command.SHAKE and max(abs(args[0]), abs(args[1])) <= SHAKE_DEAD_ZONE:
+            return
+        if self.recorder is not None:
+            self.recorder.record_command(command, args)
+
+        if self.game_over:
+            if command == Command.RESTART:
+                self.reset()
+            return
+
+        if command == Command.LEFT:
+            self.current_tetromino.move(-1, 0, self.grid, self.row_masks)
+        elif command == Command.RIGHT:
+            self.current_tetromino.move(1, 0, self.grid, self.row_masks)
+        elif command == Command.DOWN:
+            self.current_tetromino.move(0, 1, self.grid, self.row_masks)
+        elif command == Command.ROTATE:
+            self.current_tetromino.rotate(self.grid, self.row_masks)
+        elif command == Command.HARD_DROP:
+            self.hard_drop()
+        elif command == Command.PAUSE:
+            # Pause (not implemented)
+            pass
+        elif command == Command.RESTART:
+            self.reset()
+        elif command == Command.TOGGLE_DEBUG:
+            # Toggle debug grid
+            self.debug_grid = not self.debug_grid
+        elif command == Command.SHAKE:
+            # Mouse movement since the last frame, scaled like the window shake
+            dx, dy = args
+            self.apply_shake(dx, dy)
+
+
+class Snapshot:
+    """A saved Game state, taken with ``Game.snapshot()``.
+
+    Nothing is deep-copied.  The blocks, bodies and shapes stay shared with
+    the game and are pooled: the snapshot keeps the ones it saw alive, along
+    with their poses, velocities and grid bookkeeping as plain values, and
+    ``Game.restore`` puts exactly those back.  Saving costs a few tuples per
+    block.  Restoring creates one new pymunk Space, for determinism, and
+    moves the saved walls, bodies and shapes into it without copying them,
+    so both are cheap enough for lookahead search and rollback.
+    """
+
+    # Plain Game attributes that are saved and restored as they are
+    VALUES = ('score', 'level', 'lines_cleared', 'game_over', 'fall_time', 'fall_speed',
+              'lock_delay', 'lock_time', 'is_locking', 'shake_time', 'shake_force',
+              'settled_rows', 'sim_time', 'ticks', 'accumulator', 'alpha', 'debug_grid')
+
+    def __init__(self, game):
+        game.snapshots.add(self)
+        self.game = game
+        self.walls = (game.left_wall, game.right_wall, game.bottom_wall)
+        self.wall_bodies = tuple(wall.body for wall in self.walls)  # shapes only hold their body weakly
+        self.values = {name: getattr(game, name) for name in self.VALUES}
+        self.rng_state = game.rng.getstate()
+        self.tetrominoes = (game.current_tetromino.state(), game.next_tetromino.state())
+
+        frozen_bodies = game.frozen_bodies
+        self.bodies = tuple(
+            (body, True, None, body.position, body.angle, None, None, None, None, False)
+            if body in frozen_bodies else
+            (body, False, (body.mass, body.moment, body.center_of_gravity), body.position, body.angle,
+             body.velocity, body.angular_velocity, body.force, body.torque, body.is_sleeping)
+            for body in game.body_blocks)
+        self.blocks = tuple((block, block.body, block.grid_pos, block.frozen, block.asleep,
+                             block.prev_position, block.prev_angle) for block in game.blocks)
+        self.body_blocks = {body: tuple(blocks) for body, blocks in game.body_blocks.items()}
+        self.frozen_bodies = dict(frozen_bodies)
+        self.shake_bodies = tuple(game.shake_bodies)
+
+        grid = game.grid
+        self.grid = grid.copy() if board.is_array(grid) else [row[:] for row in grid]
+        self.row_cells = [{x: tuple(occupants) for x, occupants in cells.items()} for cells in game.row_cells]
+        self.row_masks = tuple(game.row_masks)
+        self.column_masks = tuple(game.column_masks)
+        self.row_rest = tuple(game.row_rest)
+        self.awake_rows = frozenset(game.awake_rows)
@@ -0,0 +1,79 @@
+"""Run many independent boards in one process.
+
+Each ``Game`` owns its own physics space, borders and RNG, so boards can be
+stepped side by side from a single loop:
+
+    boards = MultiBoard(4, seed=7)
+    boards.apply_command(0, Command.LEFT)
+    boards.update(16)
+
+``draw`` tiles every board into one surface; it imports pygame lazily so
+headless runners never load it.  Each board is drawn by a renderer of its
+own, since a renderer's block and text caches only hold one game's frame.
+"""
+import math
+
+from .constants import HEIGHT, WIDTH
+from .core import Game
+
+
+class MultiBoard:
+    def __init__(self, count, seed=None):
+        # Board i is seeded with seed + i so a run is reproducible but boards differ
+        self.games = [Game(seed=None if seed is None else seed + i) for i in range(count)]
+        self._board_surface = None
+        self._renderers = None  # (renderer passed to draw, one renderer per board)
+
+    def __len__(self):
+        return len(self.games)
+
+    def __getitem__(self, index):
+        return self.games[index]
+
+    def apply_command(self, index, command, *args):
+        self.games[index].apply_command(command, *args)
+
+    def update(self, dt):
+        for game in self.games:
+            game.update(dt)
+
+    def tile_layout(self, surface_size):
+        # Smallest near-square grid of columns and rows that fits every board
+        columns = math.ceil(math.sqrt(len(self.games)))
+        rows = math.ceil(len(self.games) / columns)
+        scale = min(surface_size[0] / (columns * WIDTH), surface_size[1] / (rows * HEIGHT))
+        tile_width = int(WIDTH * scale)
+        tile_height = int(HEIGHT * scale)
+
+        tiles = []
+        for i in range(len(self.games)):
+            column, row = i % columns, i // columns
+            tiles.append((column * tile_width, row * tile_height, tile_width, tile_height))
+        return tiles
+
+    def board_renderers(self, renderer):
+        # Fonts and block sprites look the same on every board, so the board
+        # renderers share them with the one given
+        if self._renderers is None or self._renderers[0] is not renderer:
+            from .render import Renderer
+
+            renderers = []
+            for _ in self.games:
+                board_renderer = Renderer()
+                board_renderer.fonts = renderer.fonts
+                board_renderer.sprites = renderer.sprites
+                renderers.append(board_renderer)
+            self._renderers = (renderer, renderers)
+        return self._renderers[1]
+
+    def draw(self, surface, renderer):
+        import pygame
+
+        if self._board_surface is None:
+            self._board_surface = pygame.Surface((WIDTH, HEIGHT))
+
+        # Render each board at full size, then scale it down into its tile
+        renderers = self.board_renderers(renderer)
+        for game, board_renderer, tile in zip(self.games, renderers, self.tile_layout(surface.get_size())):
+            board_renderer.draw(self._board_surface, game)
+            surface.blit(pygame.transform.smoothscale(self._board_surface, tile[2:]), tile[:2])
@@ -0,0 +1,98 @@
+"""Precomputed rotation states and bitmask collision for tetrominoes.
+
+Every entry in ``SHAPES`` is rotated into its four states once, at import.
+Each state is also stored as row bitmasks (bit ``x`` of a row is column
+``x``), so checking a piece against the board is a handful of integer ANDs
+against ``Game.row_masks`` instead of a loop over grid cells.
+"""
+from .constants import GRID_HEIGHT, GRID_WIDTH, SHAPES
+
+
+def rotate_coords(coords):
+    # Rotate 90 degrees clockwise
+    return [(coord[1], -coord[0]) for coord in coords]
+
+
+def rotation_states(coords):
+    states = [list(coords)]
+    for _ in range(3):
+        states.append(rotate_coords(states[-1]))
+    return states
+
+
+def row_masks_for(coords):
+    # (leftmost column offset, width, ((row offset, bits), ...)) for one state
+    min_x = min(x for x, _ in coords)
+    max_x = max(x for x, _ in coords)
+    rows = {}
+    for x, y in coords:
+        rows[y] = rows.get(y, 0) | 1 << (x - min_x)
+    return min_x, max_x - min_x + 1, tuple(sorted(rows.items()))
+
+
+def column_bottoms_for(coords):
+    # ((column offset, lowest row offset in that column), ...) for one state
+    bottoms = {}
+    for x, y in coords:
+        bottoms[x] = max(y, bottoms.get(x, y))
+    return tuple(sorted(bottoms.items()))
+
+
+# ROTATIONS[type][rotation] is the list of (x, y) cells for that state
+ROTATIONS = [rotation_states(coords) if coords else [] for coords in SHAPES]
+PIECE_ROWS = [[row_masks_for(state) for state in states] for states in ROTATIONS]
+PIECE_COLUMNS = [[column_bottoms_for(state) for state in states] for states in ROTATIONS]
+
+# Offsets tried in order when a rotation is blocked; staying put comes first
+KICKS = [
+    [],
+    [(0, 0), (-1, 0), (1, 0), (-2, 0), (2, 0), (0, -1)],  # I
+] + [[(0, 0), (-1, 0), (1, 0), (0, -1)] for _ in range(6)]
+
+FULL_ROW = (1 << GRID_WIDTH) - 1
+
+
+def fits(row_masks, tetromino_type, rotation, x, y):
+    # Same rules as board.fits: inside the walls, above the floor, off other blocks
+    min_x, width, rows = PIECE_ROWS[tetromino_type][rotation]
+    shift = x + min_x
+    if shift < 0 or shift + width > GRID_WIDTH:
+        return False
+    for dy, bits in rows:
+        row = y + dy
+        if row >= GRID_HEIGHT:
+            return False
+        if row >= 0 and row_masks[row] & (bits << shift):
+            return False
+    return True
+
+
+def overlaps(row_masks, tetromino_type, rotation, x, y):
+    # True if any cell of the piece inside the grid is occupied; cells outside
+    # it are not compared
+    min_x, _, rows = PIECE_ROWS[tetromino_type][rotation]
+    shift = x + min_x
+    for dy, bits in rows:
+        row = y + dy
+        if 0 <= row < GRID_HEIGHT:
+            placed = bits << shift if shift >= 0 else bits >> -shift
+            if row_masks[row] & placed & FULL_ROW:
+                return True
+    return False
+
+
+def drop_distance(column_masks, tetromino_type, rotation, x, y):
+    # Rows a piece can fall before landing, from the first occupied cell under
+    # each of its columns (bit y of a column mask is row y).  A piece still
+    # above the top of the grid can fall more than GRID_HEIGHT rows.
+    distance = None
+    for dx, bottom in PIECE_COLUMNS[tetromino_type][rotation]:
+        below = y + bottom + 1
+        blocked = column_masks[x + dx] >> max(below, 0)
+        if blocked:
+            landing = max(below, 0) + (blocked & -blocked).bit_length() - 1
+        else:
+            landing = GRID_HEIGHT
+        if distance is None or landing - below < distance:
+            distance = landing - below
+    return distance
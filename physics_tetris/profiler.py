@@ -0,0 +1,173 @@
+"""Per-phase frame timers, for finding slow frames without an external profiler.
+
+A ``Profiler`` times the phases of every frame: event handling, the
+physics ``space.step`` calls, syncing the grid from the blocks, clearing
+lines, rendering and flipping the display.  ``Game.step`` times its own
+phases when a profiler is attached to it; the front end times the rest:
+
+    profiler = Profiler(trace="frames.csv")
+    game.profiler = profiler
+    while True:
+        profiler.begin_frame()
+        ...handle events...
+        profiler.lap("events")
+        game.update(dt)
+        profiler.mark()
+        renderer.draw(screen, game)
+        profiler.lap("render")
+        pygame.display.flip()
+        profiler.lap("flip")
+        profiler.end_frame(game)
+
+Rolling p50/p95/p99 of the frame time, each phase and the body, awake body
+and contact counts over the last ``WINDOW`` frames are kept in
+``Profiler.summary``, which the renderer shows while the debug grid is on.
+Counting bodies walks every contact, so it is only done while the overlay
+is shown or a trace is written.
+
+With ``trace`` every frame is also written to a CSV (``.csv``) or JSON
+lines file, and each time the summary is refreshed its percentiles go in
+that frame's row as well (blank, or left out of the JSON, on other rows).
+"""
+import csv
+import json
+import math
+from collections import deque
+from time import perf_counter
+
+import pymunk
+
+PHASES = ("events", "space_step", "grid_sync", "clear_lines", "render", "flip")
+COUNTS = ("bodies", "awake_bodies", "contacts")
+METRICS = ("frame", *PHASES, *COUNTS)
+
+WINDOW = 300  # frames the rolling percentiles cover, five seconds at 60 FPS
+SUMMARY_INTERVAL = 30  # frames between refreshes of Profiler.summary
+PERCENTILES = (0.5, 0.95, 0.99)
+
+SUMMARY_FIELDS = tuple(f"{metric}_p{round(fraction * 100)}" for metric in METRICS for fraction in PERCENTILES)
+TRACE_FIELDS = ("frame", "frame_ms", *(f"{phase}_ms" for phase in PHASES), *COUNTS, *SUMMARY_FIELDS)
+
+
+def percentile(values, fraction):
+    # Nearest-rank percentile of an already sorted sequence
+    if not values:
+        return 0
+    return values[min(len(values) - 1, max(0, math.ceil(fraction * len(values)) - 1))]
+
+
+def count_bodies(space):
+    # Dynamic bodies, the awake ones among them, and the contacts touching an
+    # awake body (the ones the solver works on; a contact between two awake
+    # bodies counts once for each)
+    bodies = awake = 0
+    contacts = []
+    for body in space.bodies:
+        if body.body_type != pymunk.Body.DYNAMIC:
+            continue
+        bodies += 1
+        if not body.is_sleeping:
+            awake += 1
+            body.each_arbiter(contacts.append)
+    return bodies, awake, len(contacts)
+
+
+class TraceWriter:
+    """Writes one row per frame, as CSV or as JSON lines.
+
+    Values of None are empty CSV cells and are left out of JSON lines.
+    """
+
+    def __init__(self, path):
+        self.stream = open(path, "w", newline="")
+        self.writer = None
+        if path.endswith(".csv"):
+            self.writer = csv.writer(self.stream)
+            self.writer.writerow(TRACE_FIELDS)
+
+    def write(self, row):
+        if self.writer is not None:
+            self.writer.writerow(row)
+        else:
+            self.stream.write(json.dumps({field: value for field, value in zip(TRACE_FIELDS, row)
+                                          if value is not None}) + "\n")
+
+    def close(self):
+        self.stream.close()
+
+
+class Profiler:
+    def __init__(self, trace=None, window=WINDOW):
+        self.phases = dict.fromkeys(PHASES, 0.0)  # seconds spent in each phase this frame
+        self.history = {metric: deque(maxlen=window) for metric in METRICS}
+        self.summary = {}  # metric -> (p50, p95, p99), refreshed every SUMMARY_INTERVAL frames
+        self.frames = 0
+        self.frame_start = 0.0
+        self.last = 0.0  # when the phase being timed started
+        self.trace = TraceWriter(trace) if trace else None
+
+    def close(self):
+        if self.trace is not None:
+            self.trace.close()
+            self.trace = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def begin_frame(self):
+        for phase in self.phases:
+            self.phases[phase] = 0.0
+        self.frame_start = self.last = perf_counter()
+
+    def mark(self):
+        # Start timing a phase here
+        self.last = perf_counter()
+
+    def lap(self, phase):
+        # Add the time since the last mark or lap to phase; a phase can be
+        # timed several times a frame (once per fixed step) and adds up
+        now = perf_counter()
+        self.phases[phase] += now - self.last
+        self.last = now
+
+    def end_frame(self, game=None, overlay=True):
+        # The frame time is taken before counting bodies, so counting does
+        # not show up in it.  The game's bodies are counted only while the
+        # overlay shows them or a trace is written; without a game (one
+        # stepped on another thread) they are not counted at all, and the
+        # counts drop out of the summary.
+        frame_ms = (perf_counter() - self.frame_start) * 1000
+        counts = (None,) * len(COUNTS)
+        if game is not None and (overlay or self.trace is not None):
+            counts = count_bodies(game.space)
+
+        history = self.history
+        history["frame"].append(frame_ms)
+        for phase, seconds in self.phases.items():
+            history[phase].append(seconds * 1000)
+        for name, count in zip(COUNTS, counts):
+            if count is None:
+                history[name].clear()  # stale once frames go uncounted
+            else:
+                history[name].append(count)
+
+        self.frames += 1
+        refreshed = self.frames % SUMMARY_INTERVAL == 0 or not self.summary
+        if refreshed:
+            self.update_summary()
+
+        if self.trace is not None:
+            summary = (None,) * len(SUMMARY_FIELDS)
+            if refreshed:
+                summary = tuple(value for metric in METRICS
+                                for value in self.summary.get(metric, (None,) * len(PERCENTILES)))
+            self.trace.write((self.frames - 1, frame_ms, *(seconds * 1000 for seconds in self.phases.values()),
+                              *counts, *summary))
+
+    def update_summary(self):
+        # Metrics with no frames recorded, like uncounted bodies, are left out
+        self.summary = {metric: tuple(percentile(sorted(values), fraction) for fraction in PERCENTILES)
+                        for metric, values in self.history.items() if values}
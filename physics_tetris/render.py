@@ -0,0 +1,343 @@
+"""pygame drawing for a headless ``Game``.
+
+Kept apart from ``core`` so that the simulation can be imported and run
+without pygame.
+"""
+import math
+
+import pygame
+from pymunk import Vec2d
+
+from .constants import (
+    BLACK, BLOCK_SIZE, BORDER_COLOR, BORDER_WIDTH, DARK_GRAY, GRID_COLOR,
+    GRID_HEIGHT, GRID_OFFSET_X, GRID_OFFSET_Y, GRID_WIDTH, HEIGHT, WHITE,
+    WIDTH,
+)
+from .profiler import COUNTS, METRICS
+
+
+# Lines listed under the score; they never change, so they are baked into the background
+CONTROLS = [
+    "Controls:",
+    "Arrow Keys - Move",
+    "Up - Rotate",
+    "Space - Hard Drop",
+    "P - Pause",
+    "R - Restart",
+    "D - Toggle Debug Grid/Timings",
+    "Shake mouse - Move blocks"
+]
+
+NEXT_BOX = (GRID_OFFSET_X + GRID_WIDTH * BLOCK_SIZE + 40, GRID_OFFSET_Y + 20, 150, 100)
+UI_X = GRID_OFFSET_X + GRID_WIDTH * BLOCK_SIZE + 40
+
+# Block sprites are pre-rendered at this many angles per quarter turn; a
+# square looks the same every 90 degrees, so that covers every rotation
+ANGLE_STEPS = 24
+SPRITE_SIZE = int(math.ceil(BLOCK_SIZE * math.sqrt(2))) + 2
+
+# Screen regions redrawn when the next piece or the score panel changes
+NEXT_PIECE_RECT = pygame.Rect(NEXT_BOX[0], NEXT_BOX[1], NEXT_BOX[2], 6 * BLOCK_SIZE)
+UI_RECT = pygame.Rect(UI_X, GRID_OFFSET_Y + 140, WIDTH - UI_X, 110)
+
+# Debug timing overlay, in the space left of the board; times are in ms
+PROFILE_X = 10
+PROFILE_VALUES_X = 90
+
+
+class Renderer:
+    """Draws a Game, caching everything that does not change between frames.
+
+    Fonts are loaded once, the grid, border, next-piece box and controls list
+    are pre-rendered into one background surface, and text whose value has
+    not changed (score, level, lines) is reused instead of re-rendered.
+    Blocks are blitted from a sprite atlas keyed by colour and quantized
+    angle, and sleeping blocks reuse the blit from the previous frame.
+
+    With ``track_dirty`` the renderer also records which screen regions the
+    last ``draw`` changed in ``dirty_rects``, for ``pygame.display.update``.
+    ``dirty_rects`` is None whenever the whole screen should be flipped.
+
+    Given a ``profiler.Profiler``, its rolling frame timings and body counts
+    are shown next to the board while the debug grid is on.
+    """
+
+    def __init__(self, track_dirty=False, profiler=None):
+        self.fonts = {}
+        self.text_cache = {}  # slot -> (value, rendered surface)
+        self.background = None
+        self.game_over_overlay = None
+        self.sprites = {}  # (color, angle step) -> pre-rendered block
+        self.block_blits = {}  # block -> (sprite, position) from the last frame
+        self.resting_blocks = set()  # blocks that were asleep or frozen at the last frame
+
+        # Dirty-rectangle tracking
+        self.track_dirty = track_dirty
+        self.dirty_rects = None
+        self.last_frame = None  # what was on screen after the last draw
+
+        self.profiler = profiler
+
+    def font(self, size):
+        if size not in self.fonts:
+            self.fonts[size] = pygame.font.SysFont('Arial', size)
+        return self.fonts[size]
+
+    def text(self, slot, value, size):
+        # Render value, or reuse the surface from the last frame if it is unchanged
+        cached = self.text_cache.get(slot)
+        if cached is None or cached[0] != value:
+            cached = (value, self.font(size).render(value, True, WHITE))
+            self.text_cache[slot] = cached
+        return cached[1]
+
+    def build_background(self):
+        background = pygame.Surface((WIDTH, HEIGHT))
+        background.fill(BLACK)
+
+        # Draw grid
+        for y in range(GRID_HEIGHT):
+            for x in range(GRID_WIDTH):
+                rect = (
+                    GRID_OFFSET_X + x * BLOCK_SIZE,
+                    GRID_OFFSET_Y + y * BLOCK_SIZE,
+                    BLOCK_SIZE,
+                    BLOCK_SIZE
+                )
+                pygame.draw.rect(background, GRID_COLOR, rect, 1)
+
+        # Draw border
+        pygame.draw.rect(background, BORDER_COLOR, (
+            GRID_OFFSET_X - BORDER_WIDTH,
+            GRID_OFFSET_Y - BORDER_WIDTH,
+            GRID_WIDTH * BLOCK_SIZE + BORDER_WIDTH * 2,
+            GRID_HEIGHT * BLOCK_SIZE + BORDER_WIDTH * 2
+        ), BORDER_WIDTH)
+
+        # Draw next tetromino box
+        next_box_x, next_box_y = NEXT_BOX[:2]
+        pygame.draw.rect(background, DARK_GRAY, NEXT_BOX)
+        pygame.draw.rect(background, BORDER_COLOR, NEXT_BOX, 2)
+        text = self.font(20).render("Next:", True, WHITE)
+        background.blit(text, (next_box_x + 10, next_box_y + 10))
+
+        # Controls
+        controls_y = GRID_OFFSET_Y + 280
+        small_font = self.font(16)
+        for i, line in enumerate(CONTROLS):
+            text = small_font.render(line, True, WHITE)
+            background.blit(text, (UI_X, controls_y + i * 20))
+
+        # Match the display format when there is one, so blitting needs no conversion
+        if pygame.display.get_surface() is not None:
+            background = background.convert()
+        return background
+
+    def build_game_over_overlay(self):
+        # Semi-transparent overlay
+        overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
+        overlay.fill((0, 0, 0, 150))
+        return overlay
+
+    def draw(self, surface, game):
+        # Draw background, grid, border and static panels
+        if self.background is None:
+            self.background = self.build_background()
+        surface.blit(self.background, (0, 0))
+
+        # Draw occupied cells differently if debug grid is on
+        if game.debug_grid:
+            for y in range(GRID_HEIGHT):
+                for x in range(GRID_WIDTH):
+                    if game.grid[y][x] != 0:
+                        rect = (
+                            GRID_OFFSET_X + x * BLOCK_SIZE,
+                            GRID_OFFSET_Y + y * BLOCK_SIZE,
+                            BLOCK_SIZE,
+                            BLOCK_SIZE
+                        )
+                        pygame.draw.rect(surface, (100, 0, 0), rect, 0)
+                        pygame.draw.rect(surface, GRID_COLOR, rect, 1)
+
+        # Draw physics blocks
+        last_blits = self.block_blits
+        self.draw_blocks(surface, game.blocks, game.alpha)
+
+        # Draw current tetromino preview
+        if not game.game_over:
+            self.draw_preview(surface, game.current_tetromino)
+
+        # Draw next tetromino
+        self.draw_next_tetromino(surface, game)
+
+        # Draw UI
+        self.draw_ui(surface, game)
+
+        # Draw frame timings with the debug grid
+        if game.debug_grid and self.profiler is not None:
+            self.draw_profile(surface, self.profiler)
+
+        # Draw game over
+        if game.game_over:
+            self.draw_game_over(surface, game)
+
+        if self.track_dirty:
+            self.dirty_rects = self.find_dirty_rects(game, last_blits)
+
+    def find_dirty_rects(self, game, last_blits):
+        preview_cells = () if game.game_over else tuple(game.current_tetromino.cells())
+        frame = {
+            'game': (game, game.game_over, game.debug_grid),
+            'preview': preview_cells,
+            'next': game.next_tetromino.type,
+            'ui': (game.score, game.level, game.lines_cleared),
+        }
+        last_frame, self.last_frame = self.last_frame, frame
+
+        # Shakes move everything, and the debug grid follows every block
+        if (last_frame is None or last_frame['game'] != frame['game'] or
+                game.shake_time > 0 or game.debug_grid):
+            return None
+
+        rects = []
+
+        # Blocks that moved, appeared or were cleared
+        for block, blit in self.block_blits.items():
+            old_blit = last_blits.pop(block, None)
+            if old_blit != blit:
+                if old_blit is not None:
+                    rects.append(pygame.Rect(old_blit[1], (SPRITE_SIZE, SPRITE_SIZE)))
+                rects.append(pygame.Rect(blit[1], (SPRITE_SIZE, SPRITE_SIZE)))
+        for old_blit in last_blits.values():
+            rects.append(pygame.Rect(old_blit[1], (SPRITE_SIZE, SPRITE_SIZE)))
+
+        # Falling piece
+        if frame['preview'] != last_frame['preview']:
+            for x, y in last_frame['preview'] + frame['preview']:
+                rects.append(pygame.Rect(GRID_OFFSET_X + x * BLOCK_SIZE, GRID_OFFSET_Y + y * BLOCK_SIZE,
+                                         BLOCK_SIZE, BLOCK_SIZE))
+
+        if frame['next'] != last_frame['next']:
+            rects.append(NEXT_PIECE_RECT)
+        if frame['ui'] != last_frame['ui']:
+            rects.append(UI_RECT)
+        return rects
+
+    def block_sprite(self, color, step):
+        key = (color, step)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            sprite = pygame.Surface((SPRITE_SIZE, SPRITE_SIZE), pygame.SRCALPHA)
+            center = Vec2d(SPRITE_SIZE / 2, SPRITE_SIZE / 2)
+            half = (BLOCK_SIZE - 2) / 2
+            angle = step * (math.pi / 2) / ANGLE_STEPS
+            vertices = [center + Vec2d(x, y).rotated(angle)
+                        for x, y in ((-half, -half), (half, -half), (half, half), (-half, half))]
+
+            # Draw the block
+            pygame.draw.polygon(sprite, color, vertices)
+            pygame.draw.polygon(sprite, tuple(max(0, c - 50) for c in color), vertices, 2)
+            if pygame.display.get_surface() is not None:
+                sprite = sprite.convert_alpha()
+            self.sprites[key] = sprite
+        return sprite
+
+    def block_blit(self, block, alpha):
+        position, angle = block.interpolated_pose(alpha)
+        step = round(angle / (math.pi / 2) * ANGLE_STEPS) % ANGLE_STEPS
+        offset = SPRITE_SIZE / 2
+        return (self.block_sprite(block.color, step),
+                (round(position.x - offset), round(position.y - offset)))
+
+    def draw_blocks(self, surface, blocks, alpha=1.0):
+        # Blocks that were already asleep or frozen last frame cannot have
+        # moved, so their last blit is reused as is
+        last_blits, last_resting = self.block_blits, self.resting_blocks
+        self.block_blits = {}
+        self.resting_blocks = set()
+        for block in blocks:
+            resting = block.is_resting()
+            blit = last_blits.get(block)
+            if blit is None or not (resting and block in last_resting):
+                blit = self.block_blit(block, alpha)
+            if resting:
+                self.resting_blocks.add(block)
+            self.block_blits[block] = blit
+        surface.blits(list(self.block_blits.values()), doreturn=False)
+
+    def draw_preview(self, surface, tetromino):
+        for coord in tetromino.shape_coords:
+            x = tetromino.grid_x + coord[0]
+            y = tetromino.grid_y + coord[1]
+
+            # Only draw if within the grid area
+            if 0 <= x < GRID_WIDTH and 0 <= y < GRID_HEIGHT:
+                screen_x = GRID_OFFSET_X + x * BLOCK_SIZE
+                screen_y = GRID_OFFSET_Y + y * BLOCK_SIZE
+
+                pygame.draw.rect(surface, tetromino.color,
+                                (screen_x + 1, screen_y + 1, BLOCK_SIZE - 2, BLOCK_SIZE - 2))
+                pygame.draw.rect(surface, tuple(max(0, c - 50) for c in tetromino.color),
+                                (screen_x + 1, screen_y + 1, BLOCK_SIZE - 2, BLOCK_SIZE - 2), 2)
+
+    def draw_next_tetromino(self, surface, game):
+        # The box and its label are part of the background
+        next_box_x, next_box_y = NEXT_BOX[:2]
+
+        # Draw next tetromino
+        next_tetromino = game.next_tetromino
+        for coord in next_tetromino.shape_coords:
+            x = coord[0] + 2  # Center in the box
+            y = coord[1] + 2
+            screen_x = next_box_x + (x + 1) * BLOCK_SIZE
+            screen_y = next_box_y + (y + 1) * BLOCK_SIZE
+
+            pygame.draw.rect(surface, next_tetromino.color,
+                           (screen_x, screen_y, BLOCK_SIZE - 2, BLOCK_SIZE - 2))
+            pygame.draw.rect(surface, tuple(max(0, c - 50) for c in next_tetromino.color),
+                           (screen_x, screen_y, BLOCK_SIZE - 2, BLOCK_SIZE - 2), 2)
+
+    def draw_ui(self, surface, game):
+        # Draw score and level; text is only re-rendered when the value changes
+        surface.blit(self.text('score', f"Score: {game.score}", 24), (UI_X, GRID_OFFSET_Y + 140))
+        surface.blit(self.text('level', f"Level: {game.level}", 24), (UI_X, GRID_OFFSET_Y + 180))
+        surface.blit(self.text('lines', f"Lines: {game.lines_cleared}", 24), (UI_X, GRID_OFFSET_Y + 220))
+
+    def draw_profile(self, surface, profiler):
+        # p50/p95/p99 of each metric; the summary only changes a few times a
+        # second, so most frames reuse the rendered text.  Metrics that were
+        # not recorded, like body counts of a game on another thread, are
+        # left out.
+        x, y = PROFILE_X, GRID_OFFSET_Y
+        surface.blit(self.text('profile', "p50 / p95 / p99", 16), (x + PROFILE_VALUES_X, y))
+        for metric in METRICS:
+            values = profiler.summary.get(metric)
+            if values is None:
+                continue
+            y += 20
+            if metric in COUNTS:
+                value = " / ".join(f"{v:.0f}" for v in values)
+            else:
+                value = " / ".join(f"{v:.2f}" for v in values)
+            surface.blit(self.text(f'profile_label:{metric}', metric, 16), (x, y))
+            surface.blit(self.text(f'profile:{metric}', value, 16), (x + PROFILE_VALUES_X, y))
+
+    def draw_game_over(self, surface, game):
+        if self.game_over_overlay is None:
+            self.game_over_overlay = self.build_game_over_overlay()
+        surface.blit(self.game_over_overlay, (0, 0))
+
+        # Game over text
+        game_over_text = self.text('game_over', "GAME OVER", 48)
+        text_rect = game_over_text.get_rect(center=(WIDTH // 2, HEIGHT // 2 - 40))
+        surface.blit(game_over_text, text_rect)
+
+        # Final score
+        score_text = self.text('final_score', f"Final Score: {game.score}", 32)
+        score_rect = score_text.get_rect(center=(WIDTH // 2, HEIGHT // 2 + 20))
+        surface.blit(score_text, score_rect)
+
+        # Restart prompt
+        restart_text = self.text('restart', "Press R to restart", 24)
+        restart_rect = restart_text.get_rect(center=(WIDTH // 2, HEIGHT // 2 + 70))
+        surface.blit(restart_text, restart_rect)
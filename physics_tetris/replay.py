@@ -0,0 +1,306 @@
+"""Deterministic replay recording and headless playback.
+
+A replay is the game's seed and settings, followed by every input command
+tagged with the fixed step it was applied before, plus a checksum of the
+game state every ``CHECKSUM_INTERVAL`` steps.  Because the simulation only
+advances in fixed steps and pieces come from the seeded RNG, re-applying the
+commands at the same steps reproduces the session exactly, and the
+checksums show where it stops doing so.
+
+    recorder = Recorder(game)          # game must have a seed
+    ...play...
+    recorder.save("session.ptr")
+
+    player = Player.load("session.ptr")
+    player.seek(3600)                  # state after one minute at 60 Hz
+    player.run()                       # to the end, as fast as possible
+
+The recorder only watches: the game plays exactly as it would unrecorded.
+
+The file layout is little-endian::
+
+    header   b"PTRP", version u8, seed i64, timestep f64, substeps u8,
+             flags u8 (1 numpy board, 2 compound pieces), freeze_after f64
+             (NaN for off), shake profile name (u8 length + ASCII), then
+             gravity, shake strength, block friction and block elasticity,
+             f64 each
+    records  kind u8, tick u32, then
+             kind 0 (command): command u8, argument count u8, arguments f64...
+             kind 1 (checksum): crc32 u32, state after the step and before
+             that step's commands
+             kind 2 (end): crc32 u32, final state after every command
+"""
+import math
+import struct
+import zlib
+
+from .core import Command, Game
+
+MAGIC = b"PTRP"
+VERSION = 3
+CHECKSUM_INTERVAL = 60  # fixed steps between recorded state checksums
+
+COMMAND_RECORD = 0
+CHECKSUM_RECORD = 1
+END_RECORD = 2
+
+HEADER = struct.Struct("<4sBqdBBd")
+PHYSICS = struct.Struct("<4d")
+RECORD = struct.Struct("<BI")
+COMMAND = struct.Struct("<BB")
+CHECKSUM = struct.Struct("<I")
+ARGUMENT = struct.Struct("<d")
+
+FLAG_NUMPY = 1
+FLAG_COMPOUND = 2
+
+
+class ReplayError(Exception):
+    pass
+
+
+class ReplayDesync(ReplayError):
+    """Playback produced a different state from the one that was recorded."""
+
+    def __init__(self, tick, expected, actual):
+        super().__init__(f"state diverged at step {tick}: expected checksum {expected:08x}, got {actual:08x}")
+        self.tick = tick
+        self.expected = expected
+        self.actual = actual
+
+
+def state_checksum(game):
+    # CRC of everything that decides what happens next: scores, the falling
+    # piece and the exact pose and velocity of every block
+    tetromino = game.current_tetromino
+    crc = zlib.crc32(struct.pack(
+        "<qqqBbbbB?", game.score, game.lines_cleared, game.level, tetromino.type,
+        tetromino.grid_x, tetromino.grid_y, tetromino.rotation, game.next_tetromino.type,
+        game.game_over))
+    pose = struct.Struct("<6d")
+    for block in game.blocks:
+        body = block.body
+        position, velocity = body.position, body.velocity
+        crc = zlib.crc32(pose.pack(position.x, position.y, body.angle,
+                                   velocity.x, velocity.y, body.angular_velocity), crc)
+    return crc
+
+
+class Recorder:
+    """Records the commands applied to a Game and periodic state checksums.
+
+    The recorder counts fixed steps itself, so restarts (which reset
+    ``Game.ticks``) do not disturb the timeline.
+    """
+
+    def __init__(self, game):
+        if game.seed is None:
+            raise ReplayError("a game needs a seed to be recorded")
+        if game.ticks or game.blocks:
+            raise ReplayError("recording has to start with a new game")
+        self.game = game
+        self.tick = 0
+        self.header = HEADER.pack(
+            MAGIC, VERSION, game.seed, game.timestep, game.substeps,
+            (FLAG_NUMPY if game.use_numpy else 0) | (FLAG_COMPOUND if game.compound_pieces else 0),
+            math.nan if game.freeze_after is None else game.freeze_after,
+        ) + self.pack_name(game.shake_profile_name) + PHYSICS.pack(
+            game.gravity, game.shake_strength, game.block_friction, game.block_elasticity)
+        self.records = bytearray()
+        game.recorder = self
+
+    @staticmethod
+    def pack_name(name):
+        encoded = name.encode("ascii")
+        return bytes([len(encoded)]) + encoded
+
+    def record_command(self, command, args):
+        self.records += RECORD.pack(COMMAND_RECORD, self.tick)
+        self.records += COMMAND.pack(command, len(args))
+        for arg in args:
+            self.records += ARGUMENT.pack(arg)
+
+    def record_step(self, game):
+        self.tick += 1
+        if self.tick % CHECKSUM_INTERVAL == 0:
+            self.records += RECORD.pack(CHECKSUM_RECORD, self.tick)
+            self.records += CHECKSUM.pack(state_checksum(game))
+
+    def detach(self):
+        self.game.recorder = None
+
+    def to_bytes(self):
+        # Close with a checksum of the state as it is now, after the commands
+        # given since the last step, so playback can check it ends the same
+        end = RECORD.pack(END_RECORD, self.tick) + CHECKSUM.pack(state_checksum(self.game))
+        return self.header + bytes(self.records) + end
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+
+class Replay:
+    """A parsed replay file."""
+
+    def __init__(self, data):
+        if len(data) < HEADER.size or data[:4] != MAGIC:
+            raise ReplayError("not a replay file")
+        try:
+            self.parse(data)
+        except (struct.error, IndexError):
+            raise ReplayError("replay file is truncated") from None
+
+    def parse(self, data):
+        magic, version, seed, timestep, substeps, flags, freeze_after = HEADER.unpack_from(data)
+        if version != VERSION:
+            raise ReplayError(f"unsupported replay version {version}")
+        offset = HEADER.size
+        name_length = data[offset]
+        self.shake_profile = data[offset + 1:offset + 1 + name_length].decode("ascii")
+        offset += 1 + name_length
+        self.physics = dict(zip(("gravity", "shake_strength", "block_friction", "block_elasticity"),
+                                PHYSICS.unpack_from(data, offset)))  # Game keyword arguments
+        offset += PHYSICS.size
+
+        self.seed = seed
+        self.timestep = timestep
+        self.substeps = substeps
+        self.use_numpy = bool(flags & FLAG_NUMPY)
+        self.compound_pieces = bool(flags & FLAG_COMPOUND)
+        self.freeze_after = None if math.isnan(freeze_after) else freeze_after
+
+        self.commands = []  # (tick, command, args) in the order they were applied
+        self.checksums = {}  # tick -> crc32
+        self.end_checksum = None
+        self.length = 0
+        while offset < len(data):
+            kind, tick = RECORD.unpack_from(data, offset)
+            offset += RECORD.size
+            if kind == COMMAND_RECORD:
+                command, arg_count = COMMAND.unpack_from(data, offset)
+                offset += COMMAND.size
+                args = tuple(ARGUMENT.unpack_from(data, offset + i * ARGUMENT.size)[0]
+                             for i in range(arg_count))
+                offset += arg_count * ARGUMENT.size
+                self.commands.append((tick, Command(command), args))
+            elif kind == CHECKSUM_RECORD:
+                self.checksums[tick] = CHECKSUM.unpack_from(data, offset)[0]
+                offset += CHECKSUM.size
+            elif kind == END_RECORD:
+                self.end_checksum = CHECKSUM.unpack_from(data, offset)[0]
+                self.length = tick
+                offset += CHECKSUM.size
+            else:
+                raise ReplayError(f"unknown record kind {kind} at byte {offset - RECORD.size}")
+        self.length = max([tick for tick, _, _ in self.commands] + list(self.checksums) + [self.length])
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls(f.read())
+
+    def new_game(self):
+        return Game(seed=self.seed, timestep=self.timestep, substeps=self.substeps,
+                    use_numpy=self.use_numpy, compound_pieces=self.compound_pieces,
+                    freeze_after=self.freeze_after, shake_profile=self.shake_profile,
+                    **self.physics)
+
+
+class Player:
+    """Re-simulates a replay headlessly, as fast as the CPU allows.
+
+    Seeking forwards plays on from the current step.  Seeking backwards
+    plays again from the start, because a restored snapshot does not step
+    on bit for bit like the game that was recorded.
+    """
+
+    def __init__(self, replay, verify=True):
+        self.replay = replay
+        self.verify = verify
+        self.restart()
+
+    @classmethod
+    def load(cls, path, verify=True):
+        return cls(Replay.load(path), verify)
+
+    def restart(self):
+        self.game = self.replay.new_game()
+        self.tick = 0
+        self.next_command = 0
+
+    def rewind(self):
+        self.seek(0)
+
+    def apply_commands(self):
+        # Apply the commands recorded between the last step and the next one
+        commands = self.replay.commands
+        while self.next_command < len(commands) and commands[self.next_command][0] == self.tick:
+            _, command, args = commands[self.next_command]
+            self.game.apply_command(command, *args)
+            self.next_command += 1
+
+    def step(self):
+        self.apply_commands()
+
+        # A finished game does not step until it is restarted, just like Game.update
+        if self.game.game_over:
+            return False
+
+        self.game.step()
+        self.tick += 1
+
+        if self.verify and self.tick in self.replay.checksums:
+            actual = state_checksum(self.game)
+            if actual != self.replay.checksums[self.tick]:
+                raise ReplayDesync(self.tick, self.replay.checksums[self.tick], actual)
+        return True
+
+    def seek(self, tick):
+        # Jump to the state after `tick` steps, from the beginning if that
+        # is behind us
+        if tick < self.tick:
+            self.restart()
+
+        while self.tick < tick:
+            if not self.step():
+                break  # the game ended and nothing restarts it
+        return self.game
+
+    def run(self):
+        # Play to the end, including the commands given after the last step
+        self.seek(self.replay.length)
+        self.apply_commands()
+        if self.verify and self.replay.end_checksum is not None:
+            actual = state_checksum(self.game)
+            if actual != self.replay.end_checksum:
+                raise ReplayDesync(self.tick, self.replay.end_checksum, actual)
+        return self.game
+
+
+def main():
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Re-simulate a Physics Tetris replay headlessly")
+    parser.add_argument("replay", help="replay file written with --record")
+    parser.add_argument("--no-verify", action="store_true", help="skip the state checksums")
+    args = parser.parse_args()
+
+    player = Player.load(args.replay, verify=not args.no_verify)
+    start = time.perf_counter()
+    try:
+        game = player.run()
+    except ReplayDesync as error:
+        print(error)
+        raise SystemExit(1)
+    elapsed = time.perf_counter() - start
+
+    simulated = player.tick * player.replay.timestep / 1000.0
+    print(f"{player.tick} steps ({simulated:.1f}s of play) in {elapsed:.2f}s, "
+          f"{simulated / max(elapsed, 1e-9):.0f}x real time")
+    print(f"score {game.score}, lines {game.lines_cleared}, level {game.level}")
+
+
+if __name__ == "__main__":
+    main()
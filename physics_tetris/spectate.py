@@ -0,0 +1,367 @@
+"""Stream a live game to spectators over TCP or a Unix socket.
+
+``SpectatorServer`` runs an asyncio server on a background thread.  The
+game loop calls ``publish(game)`` once per frame; each frame is encoded
+once, into a reused scratch buffer, and the same bytes are written to every
+subscriber, so hundreds of spectators cost little more than one:
+
+    server = SpectatorServer(port=7777)   # or SpectatorServer(path="/tmp/tetris.sock")
+    server.start()
+    while True:
+        game.update(16)
+        server.publish(game)
+    server.stop()
+
+Frames are deltas: only the blocks that moved, appeared or went away and
+the grid cells that changed since the previous frame, plus the score,
+level, lines and pieces.  A client that joins, or falls behind, is sent a
+keyframe holding the whole state and gets deltas from there.  Writes never
+wait: a client whose unsent data passes ``max_buffer`` bytes is skipped
+until it has caught up, then resynchronised with a keyframe, so a slow
+client never stalls the game.
+
+Every message is little-endian::
+
+    length u32 (bytes that follow), kind u8 (0 keyframe, 1 delta), frame u32
+    score u32, lines u32, level u16, piece type u8, rotation u8, x i8, y i8,
+    next piece type u8, game over u8
+    removed block count u16, then block id u32 each
+    block count u16, then id u32, tetromino type u8, x f32, y f32, angle f32
+    cell count u16, then index u8 (y * GRID_WIDTH + x), tetromino type u8
+
+Keyframes start from an empty board and list every block and occupied cell.
+``SpectatorView`` applies messages on the receiving side, and
+``python -m physics_tetris.spectate ADDRESS`` follows a game from the
+command line.
+"""
+import asyncio
+import struct
+import threading
+
+from . import board
+from .constants import GRID_HEIGHT, GRID_WIDTH
+
+KEYFRAME = 0
+DELTA = 1
+
+LENGTH = struct.Struct("<I")
+FRAME = struct.Struct("<BI")
+STATE = struct.Struct("<IIHBBbbBB")
+COUNT = struct.Struct("<H")
+REMOVED = struct.Struct("<I")
+BLOCK = struct.Struct("<IBfff")
+CELL = struct.Struct("<BB")
+
+MAX_BUFFER = 256 * 1024  # unsent bytes a client may have queued before it is skipped
+CELLS = GRID_WIDTH * GRID_HEIGHT
+
+
+def parse_address(address):
+    # (host, port) for "HOST:PORT" or ":PORT", (path, None) for a socket path
+    host, _, port = address.rpartition(":")
+    if port.isdigit():
+        return host or "127.0.0.1", int(port)
+    return address, None
+
+
+class FrameEncoder:
+    """Encodes a Game as keyframes and deltas against the last frame encoded."""
+
+    def __init__(self):
+        self.buffer = bytearray(4096)
+        self.ids = {}  # block -> id sent to clients
+        self.next_id = 0
+        self.poses = {}  # block -> (x, y, angle) last encoded
+        self.cells = [[0] * GRID_WIDTH for _ in range(GRID_HEIGHT)]  # grid last encoded
+
+    def encode(self, game, frame, keyframe=False):
+        # The message for frame, against an empty board for a keyframe;
+        # either way it becomes the base for the next delta
+        blocks = game.blocks
+        previous = {} if keyframe else self.poses
+        removed = [block for block in previous if block not in blocks]
+        size = (LENGTH.size + FRAME.size + STATE.size + 3 * COUNT.size + len(removed) * REMOVED.size +
+                len(blocks) * BLOCK.size + CELLS * CELL.size)
+        if size > len(self.buffer):
+            self.buffer = bytearray(size * 2)
+        buffer = self.buffer
+
+        tetromino, next_tetromino = game.current_tetromino, game.next_tetromino
+        offset = LENGTH.size + FRAME.size
+        STATE.pack_into(buffer, offset, game.score, game.lines_cleared, game.level, tetromino.type,
+                        tetromino.rotation, tetromino.grid_x, tetromino.grid_y, next_tetromino.type,
+                        game.game_over)
+        offset += STATE.size
+
+        ids = self.ids
+        COUNT.pack_into(buffer, offset, len(removed))
+        offset += COUNT.size
+        for block in removed:
+            REMOVED.pack_into(buffer, offset, ids.pop(block))
+            offset += REMOVED.size
+
+        count_offset = offset
+        offset += COUNT.size
+        count = 0
+        poses = {}
+        for block in blocks:
+            position = block.position()
+            pose = (position.x, position.y, block.body.angle)
+            poses[block] = pose
+            if previous.get(block) == pose:
+                continue
+            block_id = ids.get(block)
+            if block_id is None:
+                block_id = ids[block] = self.next_id
+                self.next_id = (self.next_id + 1) & 0xFFFFFFFF
+            BLOCK.pack_into(buffer, offset, block_id, block.block_type, *pose)
+            offset += BLOCK.size
+            count += 1
+        COUNT.pack_into(buffer, count_offset, count)
+        self.poses = poses
+        if keyframe:
+            # Blocks that left before the keyframe are not removed by it
+            self.ids = {block: ids[block] for block in blocks}
+
+        count_offset = offset
+        offset += COUNT.size
+        count = 0
+        grid = game.grid
+        rows = grid.tolist() if board.is_array(grid) else grid
+        for y, (row, last_row) in enumerate(zip(rows, self.cells)):
+            if row == last_row and not keyframe:
+                continue
+            for x, cell in enumerate(row):
+                if (cell != 0) if keyframe else (cell != last_row[x]):
+                    CELL.pack_into(buffer, offset, y * GRID_WIDTH + x, cell)
+                    offset += CELL.size
+                    count += 1
+            self.cells[y] = list(row)
+        COUNT.pack_into(buffer, count_offset, count)
+
+        LENGTH.pack_into(buffer, 0, offset - LENGTH.size)
+        FRAME.pack_into(buffer, LENGTH.size, KEYFRAME if keyframe else DELTA, frame)
+        return bytes(memoryview(buffer)[:offset])
+
+
+class Spectator:
+    def __init__(self, writer):
+        self.writer = writer
+        self.task = asyncio.current_task()  # the connection's handler
+        self.frame = None  # last frame sent, None until it has had a keyframe
+
+
+class SpectatorServer:
+    """Serves a game's frames to any number of clients; see the module docs."""
+
+    def __init__(self, host="127.0.0.1", port=0, path=None, max_buffer=MAX_BUFFER):
+        self.host = host
+        self.port = port
+        self.path = path  # a Unix socket path instead of TCP
+        self.max_buffer = max_buffer
+        self.encoder = FrameEncoder()
+        self.frame = 0
+        self.base = None  # frame the next delta is against
+        self.spectators = set()  # only touched on the server's loop
+        self.connected = 0
+        self.want_keyframe = False  # set by the loop when a client needs one
+        self.sent = self.skipped = 0
+        self.loop = None
+        self.server = None
+        self.thread = None
+
+    @classmethod
+    def from_address(cls, address, **kwargs):
+        # A server for "HOST:PORT", ":PORT" or the path of a Unix socket
+        host, port = parse_address(address)
+        if port is None:
+            return cls(path=host, **kwargs)
+        return cls(host=host, port=port, **kwargs)
+
+    @property
+    def address(self):
+        # Where clients connect; the actual port when port 0 was asked for
+        if self.path is not None:
+            return self.path
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def serve(self):
+        # Start listening on the running loop
+        self.loop = asyncio.get_running_loop()
+        if self.path is not None:
+            self.server = await asyncio.start_unix_server(self.handle, self.path)
+        else:
+            self.server = await asyncio.start_server(self.handle, self.host, self.port)
+
+    def start(self):
+        # Run the server on its own thread, returning once it is listening
+        ready = threading.Event()
+
+        def run():
+            loop = asyncio.new_event_loop()
+            loop.run_until_complete(self.serve())
+            ready.set()
+            loop.run_forever()
+            loop.run_until_complete(self.close())
+            loop.close()
+
+        self.thread = threading.Thread(target=run, name="spectators", daemon=True)
+        self.thread.start()
+        ready.wait()
+
+    def stop(self):
+        if self.thread is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.thread = None
+
+    async def close(self):
+        # Stop listening, hang up on every client and wait for them to go
+        self.server.close()
+        spectators = list(self.spectators)
+        for spectator in spectators:
+            spectator.writer.close()
+        await asyncio.gather(*(spectator.task for spectator in spectators), return_exceptions=True)
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        spectator = Spectator(writer)
+        self.spectators.add(spectator)
+        self.connected = len(self.spectators)
+        self.want_keyframe = True
+        try:
+            # Clients have nothing to say; reading only notices them leave
+            while await reader.read(1024):
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            self.spectators.discard(spectator)
+            self.connected = len(self.spectators)
+            writer.close()
+
+    def publish(self, game):
+        # Encode this frame and queue it for every client.  Call from the
+        # thread that steps the game, once per frame.
+        self.frame += 1
+        if not self.connected:
+            self.base = None
+            return
+        delta = keyframe = None
+        if self.base is not None:
+            delta = self.encoder.encode(game, self.frame)
+        if self.want_keyframe or self.base is None:
+            self.want_keyframe = False
+            keyframe = self.encoder.encode(game, self.frame, keyframe=True)
+        base, self.base = self.base, self.frame
+        self.loop.call_soon_threadsafe(self.broadcast, self.frame, base, delta, keyframe)
+
+    def broadcast(self, frame, base, delta, keyframe):
+        for spectator in self.spectators:
+            transport = spectator.writer.transport
+            if transport.is_closing() or transport.get_write_buffer_size() > self.max_buffer:
+                self.skipped += 1
+                continue
+            if delta is not None and spectator.frame == base:
+                transport.write(delta)
+            elif keyframe is not None:
+                transport.write(keyframe)
+            else:
+                # Missed a frame; it needs the whole state again
+                self.want_keyframe = True
+                self.skipped += 1
+                continue
+            spectator.frame = frame
+            self.sent += 1
+
+
+class SpectatorView:
+    """The game state on the receiving side, built up from messages."""
+
+    def __init__(self):
+        self.frame = None
+        self.blocks = {}  # id -> (tetromino type, x, y, angle)
+        self.grid = [[0] * GRID_WIDTH for _ in range(GRID_HEIGHT)]
+        self.score = self.lines_cleared = 0
+        self.level = 1
+        self.piece = None  # (type, rotation, x, y)
+        self.next_type = None
+        self.game_over = False
+
+    def apply(self, message):
+        # Apply one message, without its length prefix
+        kind, frame = FRAME.unpack_from(message)
+        offset = FRAME.size
+        if kind == KEYFRAME:
+            self.blocks.clear()
+            self.grid = [[0] * GRID_WIDTH for _ in range(GRID_HEIGHT)]
+        elif self.frame is None:
+            return False  # deltas mean nothing before the first keyframe
+        self.frame = frame
+
+        (self.score, self.lines_cleared, self.level, piece_type, rotation, x, y, self.next_type,
+         game_over) = STATE.unpack_from(message, offset)
+        self.piece = (piece_type, rotation, x, y)
+        self.game_over = bool(game_over)
+        offset += STATE.size
+
+        (count,) = COUNT.unpack_from(message, offset)
+        offset += COUNT.size
+        for block_id, in REMOVED.iter_unpack(message[offset:offset + count * REMOVED.size]):
+            self.blocks.pop(block_id, None)
+        offset += count * REMOVED.size
+
+        (count,) = COUNT.unpack_from(message, offset)
+        offset += COUNT.size
+        for block_id, block_type, x, y, angle in BLOCK.iter_unpack(message[offset:offset + count * BLOCK.size]):
+            self.blocks[block_id] = (block_type, x, y, angle)
+        offset += count * BLOCK.size
+
+        (count,) = COUNT.unpack_from(message, offset)
+        offset += COUNT.size
+        for index, cell in CELL.iter_unpack(message[offset:offset + count * CELL.size]):
+            self.grid[index // GRID_WIDTH][index % GRID_WIDTH] = cell
+        return True
+
+
+async def follow(reader, view):
+    # Yield after applying each message read from a spectator connection
+    while True:
+        try:
+            (length,) = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+            message = await reader.readexactly(length)
+        except asyncio.IncompleteReadError:
+            return
+        if view.apply(message):
+            yield view
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Follow a Physics Tetris game being broadcast")
+    parser.add_argument("address", help="HOST:PORT, or the path of a Unix socket")
+    args = parser.parse_args()
+
+    async def run():
+        host, port = parse_address(args.address)
+        if port is None:
+            reader, _ = await asyncio.open_unix_connection(host)
+        else:
+            reader, _ = await asyncio.open_connection(host, port)
+        last = None
+        async for view in follow(reader, SpectatorView()):
+            status = (view.score, view.lines_cleared, view.level, len(view.blocks), view.game_over)
+            if status != last:
+                last = status
+                print(f"frame {view.frame}: score {view.score}, lines {view.lines_cleared}, "
+                      f"level {view.level}, {len(view.blocks)} blocks" + (", game over" if view.game_over else ""))
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""Run the simulation on its own thread, at its own fixed rate.
+
+In the default loop a slow frame delays physics and a heavy physics step
+delays input, since both share one thread capped at the display rate.
+``SimulationThread`` instead steps the game on a worker thread at the
+game's fixed timestep, whatever the render rate:
+
+    sim = SimulationThread(Game(timestep=1000 / 120))  # 120 Hz physics
+    sim.start()
+    while True:
+        sim.apply_command(Command.LEFT)    # from the input thread
+        frame = sim.buffers.read()         # the latest published state
+        renderer.draw(screen, frame)
+        sim.buffers.release()
+    sim.stop()
+
+Commands go through a ``collections.deque``, whose ``append`` and
+``popleft`` are atomic, so the input side never takes a lock.  After every
+update the worker copies what the renderer needs into the back one of two
+``FrameState`` buffers and swaps it to the front; the renderer only ever
+reads the front buffer, and never touches pymunk objects that the worker is
+stepping (pymunk releases the GIL while it steps, so the two really do run
+at the same time).
+"""
+import threading
+import time
+from collections import deque
+
+from . import board
+from .core import Tetromino, interpolate_pose
+
+
+class BlockView:
+    """The pose and look of a block at the time a frame was published.
+
+    A view equals and hashes like every other view of the same block, so
+    the renderer's per-block caches work across the two buffers.
+    """
+
+    __slots__ = ('block', 'color', 'frozen', 'resting', 'offset', 'prev_position', 'prev_angle',
+                 'position', 'angle')
+
+    def __init__(self, block):
+        self.block = block
+        self.color = block.color
+        self.offset = block.offset
+
+    def __eq__(self, other):
+        return isinstance(other, BlockView) and other.block is self.block
+
+    def __hash__(self):
+        return hash(self.block)
+
+    def update(self):
+        block = self.block
+        body = block.body
+        self.frozen = block.frozen
+        self.resting = block.frozen or body.is_sleeping
+        self.offset = block.offset  # changes when a compound piece splits
+        self.prev_position = block.prev_position
+        self.prev_angle = block.prev_angle
+        self.position = body.position
+        self.angle = body.angle
+
+    def is_resting(self):
+        return self.resting
+
+    def interpolated_pose(self, alpha):
+        return interpolate_pose(self.prev_position, self.prev_angle, self.position, self.angle,
+                                self.offset, alpha)
+
+
+class FrameState:
+    """Everything ``Renderer.draw`` reads from a Game, copied at one instant.
+
+    Equal to any other frame of the same game, like ``BlockView``.
+    """
+
+    def __init__(self):
+        self.source = None  # the Game this is a copy of
+        self.views = {}  # block -> its BlockView, kept from frame to frame
+        self.blocks = []
+        self.grid = None
+        self.current_tetromino = self.next_tetromino = None
+        self.alpha = 0
+        self.debug_grid = self.game_over = False
+        self.score = self.level = self.lines_cleared = 0
+        self.shake_time = 0
+
+    def __eq__(self, other):
+        return isinstance(other, FrameState) and other.source is self.source
+
+    def __hash__(self):
+        return hash(self.source)
+
+    def update(self, game):
+        self.source = game
+        views = self.views
+        blocks = self.blocks
+        blocks.clear()
+        for block in game.blocks:
+            view = views.get(block)
+            if view is None:
+                view = views[block] = BlockView(block)
+            view.update()
+            blocks.append(view)
+        if len(views) > len(blocks):
+            self.views = {view.block: view for view in blocks}  # forget cleared blocks
+
+        # The occupancy grid is only drawn with the debug grid on
+        if game.debug_grid:
+            grid = game.grid
+            self.grid = grid.copy() if board.is_array(grid) else [row[:] for row in grid]
+        self.current_tetromino = Tetromino.from_state(game.current_tetromino.state())
+        self.next_tetromino = Tetromino.from_state(game.next_tetromino.state())
+
+        self.alpha = game.alpha
+        self.debug_grid = game.debug_grid
+        self.game_over = game.game_over
+        self.score = game.score
+        self.level = game.level
+        self.lines_cleared = game.lines_cleared
+        self.shake_time = game.shake_time
+
+
+class FrameBuffers:
+    """Two FrameStates: the worker fills the back one while the renderer reads the front.
+
+    The lock only guards the swap and the reader's claim on the front
+    buffer.  When the renderer is still reading the buffer that would be
+    filled next, the worker skips publishing that update rather than wait.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.front = FrameState()
+        self.back = FrameState()
+        self.reading = None
+        self.published = 0  # frames swapped to the front
+        self.skipped = 0  # updates not published because the renderer held the buffer
+
+    def publish(self, game):
+        with self.lock:
+            if self.reading is self.back:
+                self.skipped += 1
+                return False
+        self.back.update(game)
+        with self.lock:
+            self.front, self.back = self.back, self.front
+            self.published += 1
+        return True
+
+    def read(self):
+        # The latest frame; it stays valid until release()
+        with self.lock:
+            self.reading = self.front
+            return self.front
+
+    def release(self):
+        with self.lock:
+            self.reading = None
+
+
+class SimulationThread:
+    """Steps a Game on a worker thread and publishes frames for rendering.
+
+    ``bot``, if given, is updated on the worker before each update, since it
+    reads the game directly; ``after_update(game)`` is called on the worker
+    after each one, for anything else that needs the live game (such as
+    ``SpectatorServer.publish``).
+    """
+
+    def __init__(self, game, bot=None, after_update=None):
+        self.game = game
+        self.bot = bot
+        self.after_update = after_update
+        self.commands = deque()  # (command, args) waiting for the worker
+        self.buffers = FrameBuffers()
+        self.buffers.publish(game)
+        self.running = False
+        self.thread = None
+
+    def apply_command(self, command, *args):
+        # Safe to call from any thread
+        self.commands.append((command, args))
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="simulation", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        # Stop after the current update; the game can be used again afterwards
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def run(self):
+        game = self.game
+        commands = self.commands
+        last = time.perf_counter()
+        while self.running:
+            while commands:
+                command, args = commands.popleft()
+                game.apply_command(command, *args)
+            if self.bot is not None:
+                self.bot.update(game)
+
+            now = time.perf_counter()
+            game.update((now - last) * 1000)
+            last = now
+            self.buffers.publish(game)
+            if self.after_update is not None:
+                self.after_update(game)
+
+            # Sleep until the next fixed step is due
+            time.sleep(max(0.0, (game.timestep - game.accumulator) / 1000))
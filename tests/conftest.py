@@ -0,0 +1,45 @@
+"""Shared test helpers."""
+import random
+
+import pytest
+
+from physics_tetris import Command
+from physics_tetris.replay import state_checksum
+
+COMMANDS = (Command.LEFT, Command.RIGHT, Command.ROTATE, Command.HARD_DROP, Command.SHAKE)
+
+
+def random_play(game, seed, frames, commands=COMMANDS, rate=0.1, frame_times=None):
+    # Plays game with seeded random input, restarting it whenever it ends,
+    # and yields the command given in each frame (None for none) once the
+    # frame has run.  A frame is one fixed step, or with frame_times an
+    # update by one of those milliseconds.
+    rng = random.Random(seed)
+    for _ in range(frames):
+        command = rng.choice(commands) if rng.random() < rate else None
+        if game.game_over:
+            command = Command.RESTART
+        if command == Command.SHAKE:
+            game.apply_command(command, rng.uniform(-9, 9), rng.uniform(-9, 9))
+        elif command is not None:
+            game.apply_command(command)
+        if frame_times is None:
+            game.step()
+        else:
+            game.update(rng.choice(frame_times))
+        yield command
+
+
+def checksum_play(game, seed, frames, **options):
+    # random_play, returning the game's state checksum after every frame
+    return [state_checksum(game) for _ in random_play(game, seed, frames, **options)]
+
+
+@pytest.fixture(scope="session", name="random_play")
+def random_play_fixture():
+    return random_play
+
+
+@pytest.fixture(scope="session", name="checksum_play")
+def checksum_play_fixture():
+    return checksum_play
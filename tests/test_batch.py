@@ -0,0 +1,35 @@
+"""The headless batch runner."""
+import csv
+import json
+
+import pytest
+
+from physics_tetris import batch
+
+
+@pytest.mark.parametrize("suffix", [".jsonl", ".csv"])
+def test_main_writes_a_row_per_game(tmp_path, suffix):
+    path = tmp_path / f"runs{suffix}"
+    batch.main(["--games", "2", "--workers", "1", "--max-frames", "300", "--seed", "5",
+                "--sweep", "gravity=400,600", "--output", str(path)])
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f)) if suffix == ".csv" else [json.loads(line) for line in f]
+    assert len(rows) == 4
+    assert all(set(row) == set(batch.FIELDS) for row in rows)
+    assert sorted((float(row["gravity"]), int(row["seed"])) for row in rows) == [
+        (400, 5), (400, 6), (600, 5), (600, 6)]
+    assert all(0 < int(row["frames"]) <= 300 and int(row["pieces"]) > 0 for row in rows)
+
+
+def test_bad_sweep_is_a_usage_error(capsys):
+    with pytest.raises(SystemExit) as error:
+        batch.main(["--sweep", "gravity=abc"])
+    assert error.value.code == 2
+    assert "values must be numbers" in capsys.readouterr().err
+
+
+def test_random_policy_is_not_seeded_like_the_pieces():
+    policy = batch.RandomPolicy(3)
+    game = batch.Game(seed=3)
+    assert policy.rng.getstate() != game.rng.getstate()
+    assert batch.RandomPolicy(3).rng.random() == policy.rng.random()
@@ -0,0 +1,29 @@
+"""Smoke tests for the benchmark scenarios."""
+import pytest
+
+from benchmarks import scenarios, snapshot
+from physics_tetris.constants import HEIGHT, WIDTH
+
+
+@pytest.mark.parametrize("name", list(scenarios.SCENARIOS))
+def test_scenario_reports_every_phase(name):
+    result = scenarios.run(scenarios.SCENARIOS[name], seconds=0.1)
+    assert set(result) == set(scenarios.PHASES)
+    assert all(value >= 0 for value in result.values())
+    assert result["physics"] > 0
+
+
+def test_scenario_renders_offscreen():
+    pygame = pytest.importorskip("pygame")
+    from physics_tetris.render import Renderer
+
+    pygame.font.init()
+    result = scenarios.run(scenarios.SCENARIOS["stack"], seconds=0.1, renderer=Renderer(),
+                           surface=pygame.Surface((WIDTH, HEIGHT)))
+    assert result["render"] > 0
+
+
+def test_filled_game_has_the_blocks_asked_for():
+    game = snapshot.filled_game(50)
+    assert len(game.blocks) == 50
+    assert not game.lines_cleared
@@ -0,0 +1,61 @@
+"""The list and numpy occupancy grids."""
+import random
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from physics_tetris import Command, Game, board
+from physics_tetris.constants import GRID_HEIGHT, GRID_WIDTH
+
+
+def test_numpy_is_not_imported_until_asked_for():
+    code = "import sys, physics_tetris; physics_tetris.Game(seed=1); print('numpy' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            check=True, cwd=Path(__file__).parent.parent)
+    assert result.stdout.strip() == "False"
+
+
+def test_numpy_board_plays_like_the_list_board():
+    pytest.importorskip("numpy")
+    games = [Game(seed=4), Game(seed=4, use_numpy=True)]
+    for i in range(2000):
+        for game in games:
+            if i % 15 == 0:
+                game.apply_command((Command.LEFT, Command.RIGHT, Command.HARD_DROP)[i // 15 % 3])
+            game.update(16)
+    lists, array = games
+    assert array.grid.tolist() == lists.grid
+    assert array.lines_cleared == lists.lines_cleared
+
+
+def column_heights(grid):
+    return [next((GRID_HEIGHT - y for y in range(GRID_HEIGHT) if grid[y][x]), 0) for x in range(GRID_WIDTH)]
+
+
+def holes(grid):
+    return sum(1 for x in range(GRID_WIDTH) for y in range(GRID_HEIGHT)
+               if not grid[y][x] and any(grid[above][x] for above in range(y)))
+
+
+def test_batch_helpers_match_each_board():
+    np = pytest.importorskip("numpy")
+    rng = random.Random(2)
+    grids = []
+    for _ in range(12):
+        # Random stacks, some with full rows, every other one as an array
+        grid = board.new_grid()
+        for y in range(rng.randrange(GRID_HEIGHT), GRID_HEIGHT):
+            full = rng.random() < 0.3
+            grid[y] = [rng.randint(1, 7) if full or rng.random() < 0.6 else 0 for _ in range(GRID_WIDTH)]
+        grids.append(np.array(grid, dtype=np.int8) if len(grids) % 2 else grid)
+
+    boards = board.stack_boards(grids)
+    assert boards.shape == (len(grids), GRID_HEIGHT, GRID_WIDTH)
+    lists = [np.asarray(grid).tolist() for grid in grids]
+    assert [np.flatnonzero(rows).tolist() for rows in board.batch_full_rows(boards)] == [
+        board.full_rows(grid) for grid in grids]
+    assert board.batch_lines(boards).tolist() == [len(board.full_rows(grid)) for grid in lists]
+    assert board.batch_column_heights(boards).tolist() == [column_heights(grid) for grid in lists]
+    assert board.batch_holes(boards).tolist() == [holes(grid) for grid in lists]
@@ -0,0 +1,45 @@
+"""The placement-search autoplayer."""
+from physics_tetris import Game, pieces
+from physics_tetris.bot import SPAWN_X, SPAWN_Y, Bot, evaluate, place, placements
+from physics_tetris.constants import GRID_HEIGHT, GRID_WIDTH
+
+I_PIECE = 1
+
+
+def well_board():
+    # Four full rows at the bottom except for the rightmost column
+    row_masks = [0] * GRID_HEIGHT
+    for y in range(GRID_HEIGHT - 4, GRID_HEIGHT):
+        row_masks[y] = pieces.FULL_ROW & ~(1 << (GRID_WIDTH - 1))
+    return row_masks
+
+
+def test_placements_rest_on_the_board():
+    row_masks = well_board()
+    found = placements(row_masks, I_PIECE, SPAWN_X, SPAWN_Y)
+    # Lying flat in any of 7 columns, upright in any of 10
+    assert len(found) == 17
+    for rotation, x, y in found:
+        assert pieces.fits(row_masks, I_PIECE, rotation, x, y)
+        assert not pieces.fits(row_masks, I_PIECE, rotation, x, y + 1)
+
+
+def test_evaluate_fills_the_well():
+    row_masks = well_board()
+    results = evaluate(row_masks, I_PIECE, None, placements(row_masks, I_PIECE, SPAWN_X, SPAWN_Y))
+    _, rotation, x, y = max(results)
+    board, lines = place(row_masks, I_PIECE, rotation, x, y)
+    assert lines == 4
+    assert board == [0] * GRID_HEIGHT
+
+
+def test_pool_workers_choose_like_the_bot_alone():
+    games = [Game(seed=3), Game(seed=3)]
+    with Bot() as alone, Bot(workers=2) as pooled:
+        for _ in range(400):
+            for bot, game in zip((alone, pooled), games):
+                bot.update(game, wait=True)
+                game.step()
+    assert games[0].score == games[1].score > 0
+    assert len(games[0].blocks) == len(games[1].blocks)
+    assert games[0].row_masks == games[1].row_masks
@@ -0,0 +1,52 @@
+"""Frame capture to PNG sequences and raw video."""
+import json
+
+import pytest
+
+pygame = pytest.importorskip("pygame")
+
+from physics_tetris import capture as capture_module  # noqa: E402
+from physics_tetris.capture import FrameCapture  # noqa: E402
+
+
+def test_every_writer_is_counted(tmp_path):
+    surface = pygame.Surface((32, 24), 0, 32)
+    with FrameCapture(str(tmp_path), ring_size=8, writers=4) as capture:
+        for i in range(60):
+            surface.fill((i * 4, 0, 0))
+            assert capture.capture(surface, wait=True)
+    assert capture.written == 60
+    assert len(list(tmp_path.glob("frame*.png"))) == 60
+
+
+def test_frames_must_keep_their_height(tmp_path):
+    # Same width, bit size and pitch, but a taller buffer than the ring holds
+    path = str(tmp_path / "video.raw")
+    with FrameCapture(path) as capture:
+        capture.capture(pygame.Surface((32, 24), 0, 32), wait=True)
+        with pytest.raises(ValueError):
+            capture.capture(pygame.Surface((32, 48), 0, 32), wait=True)
+    assert (tmp_path / "video.raw").stat().st_size == 32 * 24 * 4
+
+
+def test_raw_video_formats_are_checked_up_front(tmp_path, monkeypatch):
+    capture = FrameCapture(str(tmp_path / "video.raw"))
+    surface = pygame.Surface((32, 24), 0, 32)
+    with pytest.raises(ValueError, match="32-bit"):
+        capture.check(pygame.Surface((32, 24), 0, 24))
+    capture.check(surface)
+    with monkeypatch.context() as patch:
+        # A byte order ffmpeg has no name for
+        patch.delitem(capture_module.PIXEL_FORMATS, surface.get_masks()[:3])
+        with pytest.raises(ValueError, match="byte order"):
+            capture.check(surface)
+    assert capture.slots is None  # checking captures nothing
+    FrameCapture(str(tmp_path / "frames")).check(pygame.Surface((32, 24), 0, 24))  # PNGs take any
+
+
+def test_raw_video_names_its_pixel_format(tmp_path):
+    path = tmp_path / "video.raw"
+    surface = pygame.Surface((32, 24), 0, 32, (0xFF, 0xFF00, 0xFF0000, 0))
+    with FrameCapture(str(path)) as capture:
+        capture.capture(surface, wait=True)
+    assert json.loads((tmp_path / "video.raw.json").read_text())["pix_fmt"] == "rgba"
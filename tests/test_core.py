@@ -0,0 +1,67 @@
+"""Fixed steps, shakes and the occupancy grid of the headless Game."""
+import pytest
+
+from physics_tetris import Block, Command, Game
+from physics_tetris.constants import COLORS
+
+
+def lone_block_game(**options):
+    # A single block floating without gravity, the falling piece held at the top
+    game = Game(seed=0, gravity=0, **options)
+    game.fall_speed = float("inf")
+    block = Block(game.space, (4, 10), COLORS[1], 1)
+    game.add_block(block)
+    return game, block
+
+
+@pytest.mark.parametrize("substeps", [2, 4])
+def test_shake_push_does_not_depend_on_substeps(substeps):
+    baseline, baseline_block = lone_block_game(substeps=1)
+    game, block = lone_block_game(substeps=substeps)
+    for shaken in (baseline, game):
+        shaken.apply_command(Command.SHAKE, 1, 0)
+        shaken.step()
+    assert block.body.velocity.x == pytest.approx(baseline_block.body.velocity.x)
+    assert block.body.velocity.x > 0
+
+
+@pytest.mark.parametrize("options", [{}, {"freeze_after": 500}, {"compound_pieces": True}])
+def test_grid_follows_blocks(options, random_play):
+    # Only awake blocks are re-binned each step; sleeping ones have to stay
+    # in the cell their body is in whatever wakes them
+    game = Game(seed=3, **options)
+    for i, _ in enumerate(random_play(game, 3, 3000, rate=0.05, frame_times=(16, 17, 33, 5))):
+        if i % 10 == 0:
+            for block in game.blocks:
+                if not block.frozen:
+                    assert block.grid_pos == block.compute_grid_position()
+
+
+def test_settled_stack_syncs_no_blocks():
+    game = Game(seed=0)
+    for _ in range(8):
+        game.apply_command(Command.HARD_DROP)
+    game.fall_speed = float("inf")
+    for _ in range(1200):
+        game.step()
+    assert game.blocks and all(block.body.is_sleeping for block in game.blocks)
+    assert not game.awake_blocks and not game.awake_rows
+
+
+@pytest.mark.parametrize("freeze_after", [None, 500])
+def test_shake_wakes_the_whole_board(freeze_after):
+    # A settled stack is asleep, or frozen, until a shake reaches all of it
+    game = Game(seed=0, freeze_after=freeze_after)
+    for i in range(5):
+        for _ in range(i):
+            game.apply_command(Command.LEFT if i % 2 else Command.RIGHT)
+        game.apply_command(Command.HARD_DROP)
+    game.fall_speed = float("inf")
+    for _ in range(1200):
+        game.step()
+    assert all(body.is_sleeping or body in game.frozen_bodies for body in game.body_blocks)
+
+    game.apply_command(Command.SHAKE, 3, 0)
+    assert not game.frozen_bodies
+    assert {body for body, _ in game.shake_bodies} == set(game.body_blocks)
+    assert not any(body.is_sleeping for body in game.body_blocks)
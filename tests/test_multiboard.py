@@ -0,0 +1,35 @@
+"""Many boards stepped and drawn side by side."""
+import pytest
+
+pygame = pytest.importorskip("pygame")
+
+from physics_tetris import Command, MultiBoard  # noqa: E402
+from physics_tetris.constants import HEIGHT, WIDTH  # noqa: E402
+from physics_tetris.render import Renderer  # noqa: E402
+
+
+def test_each_board_keeps_its_own_caches():
+    pygame.font.init()
+    boards = MultiBoard(4, seed=2)
+    renderer = Renderer()
+    surface = pygame.Surface((2 * WIDTH, 2 * HEIGHT))
+    for i in range(240):
+        if i % 20 == 0:
+            for index in range(len(boards)):
+                boards.apply_command(index, Command.HARD_DROP)
+        boards.update(16)
+        boards.draw(surface, renderer)
+
+    renderers = boards.board_renderers(renderer)
+    assert boards.board_renderers(renderer) is renderers
+    for game, board_renderer in zip(boards.games, renderers):
+        assert board_renderer.block_blits.keys() == set(game.blocks)
+        assert board_renderer.sprites is renderer.sprites
+
+    # Tiles match each board drawn on its own by a fresh renderer
+    board_surface = pygame.Surface((WIDTH, HEIGHT))
+    for game, tile in zip(boards.games, boards.tile_layout(surface.get_size())):
+        Renderer().draw(board_surface, game)
+        expected = pygame.transform.smoothscale(board_surface, tile[2:])
+        drawn = surface.subsurface(tile)
+        assert pygame.image.tobytes(drawn, "RGB") == pygame.image.tobytes(expected, "RGB")
@@ -0,0 +1,50 @@
+"""Rotation states and bitmask collision for tetrominoes."""
+import random
+
+import pytest
+
+from physics_tetris import pieces
+from physics_tetris.constants import GRID_HEIGHT, GRID_WIDTH
+
+
+def random_board(rng):
+    # Row and column masks of a random ragged stack
+    row_masks = [0] * GRID_HEIGHT
+    for y in range(rng.randrange(GRID_HEIGHT // 2), GRID_HEIGHT):
+        row_masks[y] = rng.getrandbits(GRID_WIDTH) & rng.getrandbits(GRID_WIDTH)
+    column_masks = [sum(1 << y for y in range(GRID_HEIGHT) if row_masks[y] >> x & 1)
+                    for x in range(GRID_WIDTH)]
+    return row_masks, column_masks
+
+
+def fall(row_masks, tetromino_type, rotation, x, y):
+    # Rows a piece falls one row at a time, like repeated Command.DOWN
+    distance = 0
+    while pieces.fits(row_masks, tetromino_type, rotation, x, y + distance + 1):
+        distance += 1
+    return distance
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_drop_distance_matches_falling_row_by_row(seed):
+    # Including pieces that start above the top of the grid
+    rng = random.Random(seed)
+    checked = 0
+    for _ in range(3000):
+        row_masks, column_masks = random_board(rng)
+        tetromino_type = rng.randint(1, 7)
+        rotation = rng.randrange(4)
+        x = rng.randrange(-2, GRID_WIDTH + 2)
+        y = rng.randrange(-4, GRID_HEIGHT)
+        if not pieces.fits(row_masks, tetromino_type, rotation, x, y):
+            continue
+        assert (pieces.drop_distance(column_masks, tetromino_type, rotation, x, y) ==
+                fall(row_masks, tetromino_type, rotation, x, y)), (tetromino_type, rotation, x, y)
+        checked += 1
+    assert checked > 100
+
+
+def test_piece_above_the_top_lands_on_the_floor():
+    # An upright I piece entirely above the grid falls more than GRID_HEIGHT rows
+    distance = pieces.drop_distance([0] * GRID_WIDTH, 1, 0, 4, -5)
+    assert distance == fall([0] * GRID_HEIGHT, 1, 0, 4, -5) == GRID_HEIGHT + 2
@@ -0,0 +1,31 @@
+"""Block bodies pooled across line clears and restarts."""
+from physics_tetris import Command, Game
+
+
+def test_restarts_with_frozen_rows(random_play):
+    # Freezing and thawing rows change body types while they touch other
+    # blocks.  Bodies pooled afterwards used to keep contacts with freed
+    # bodies, which left them asleep outside any space and hung or crashed
+    # a later space.step.
+    restarts = 0
+    for seed in (0, 5):
+        game = Game(seed=seed, freeze_after=500)
+        for command in random_play(game, seed, 12000, tuple(Command), rate=0.05,
+                                   frame_times=(16, 17, 33, 5)):
+            if command == Command.RESTART:
+                restarts += 1
+                assert not any(body.is_sleeping for body, _ in game.block_pool.free)
+    assert restarts > 50
+
+
+def test_pooled_bodies_are_reused():
+    game = Game(seed=1)
+    game.block_pool.fill()
+    pooled = {body for body, _ in game.block_pool.free}
+    for _ in range(3):
+        for _ in range(20):
+            game.apply_command(Command.HARD_DROP)
+            game.step()
+        game.apply_command(Command.RESTART)
+    assert {block.body for block in game.blocks} <= pooled
+    assert len(game.block_pool) + len(game.blocks) == len(pooled)
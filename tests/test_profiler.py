@@ -0,0 +1,59 @@
+"""Frame phase timers and their trace files."""
+import csv
+import json
+
+from physics_tetris import Command, Game, profiler
+from physics_tetris.profiler import COUNTS, SUMMARY_INTERVAL, TRACE_FIELDS, Profiler
+
+
+def profile(frames, game, **end_frame):
+    timer = game.profiler
+    for i in range(frames):
+        timer.begin_frame()
+        timer.lap("events")
+        if i % 20 == 0:
+            game.apply_command(Command.HARD_DROP)
+        game.update(16)
+        timer.end_frame(game, **end_frame)
+
+
+def test_bodies_are_only_counted_when_shown(monkeypatch):
+    counted = []
+    count_bodies = profiler.count_bodies
+    monkeypatch.setattr(profiler, "count_bodies", lambda space: counted.append(space) or count_bodies(space))
+
+    game = Game(seed=1)
+    game.profiler = Profiler()
+    profile(SUMMARY_INTERVAL, game, overlay=False)
+    assert not counted
+    assert "frame" in game.profiler.summary and "bodies" not in game.profiler.summary
+
+    profile(SUMMARY_INTERVAL, game, overlay=True)
+    assert len(counted) == SUMMARY_INTERVAL
+    assert game.profiler.summary["bodies"][2] > 0
+
+
+def test_csv_trace_has_counts_and_percentiles(tmp_path):
+    path = tmp_path / "frames.csv"
+    game = Game(seed=1)
+    with Profiler(trace=str(path)) as game.profiler:
+        profile(2 * SUMMARY_INTERVAL, game, overlay=False)
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert tuple(rows[0]) == TRACE_FIELDS and len(rows) == 2 * SUMMARY_INTERVAL
+    assert all(row[name] != "" for row in rows for name in COUNTS)
+    refreshed = [int(row["frame"]) for row in rows if row["frame_p99"]]
+    assert refreshed == [0, SUMMARY_INTERVAL - 1, 2 * SUMMARY_INTERVAL - 1]
+
+
+def test_json_trace_without_counts(tmp_path):
+    path = tmp_path / "frames.jsonl"
+    timer = Profiler(trace=str(path))
+    for _ in range(3):
+        timer.begin_frame()
+        timer.end_frame()
+    timer.close()
+    rows = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [row["frame"] for row in rows] == [0, 1, 2]
+    assert not any(name in row for row in rows for name in COUNTS)
+    assert "frame_p50" in rows[0] and "frame_p50" not in rows[1]
@@ -0,0 +1,68 @@
+"""Recording games and playing them back."""
+import pytest
+
+from physics_tetris import Command, Game
+from physics_tetris.replay import (
+    HEADER, Player, Recorder, Replay, ReplayDesync, ReplayError, state_checksum,
+)
+
+COMMANDS = (Command.LEFT, Command.RIGHT, Command.ROTATE, Command.HARD_DROP, Command.SHAKE, Command.RESTART)
+
+
+@pytest.fixture(scope="module")
+def recording(checksum_play):
+    game = Game(seed=7, freeze_after=500)
+    recorder = Recorder(game)
+    checksums = checksum_play(game, 7, 2000, commands=COMMANDS)
+    return Replay(recorder.to_bytes()), checksums
+
+
+def test_recorder_does_not_change_the_game(recording, checksum_play):
+    _, checksums = recording
+    assert checksum_play(Game(seed=7, freeze_after=500), 7, 2000, commands=COMMANDS) == checksums
+
+
+def test_playback_matches_the_recording(recording):
+    replay, _ = recording
+    assert replay.commands and replay.length == 2000
+    game = Player(replay).run()
+    assert state_checksum(game) == replay.end_checksum
+
+
+def test_seek_gives_the_recorded_state(recording):
+    replay, checksums = recording
+    player = Player(replay)
+    for tick in (1500, 700, 1999, 1, 1200):
+        game = player.seek(tick)
+        assert player.tick == tick
+        assert state_checksum(game) == checksums[tick - 1]
+
+
+def test_playback_reports_a_desync(recording):
+    replay, _ = recording
+    tick = sorted(replay.checksums)[5]
+    checksums = dict(replay.checksums)
+    try:
+        replay.checksums[tick] ^= 1
+        with pytest.raises(ReplayDesync) as error:
+            Player(replay).seek(tick)
+        assert error.value.tick == tick
+    finally:
+        replay.checksums = checksums
+
+
+def test_small_shakes_are_not_recorded():
+    game = Game(seed=1)
+    recorder = Recorder(game)
+    game.apply_command(Command.SHAKE, 0.5, -0.3)
+    game.apply_command(Command.SHAKE, 0.2, 3)
+    game.step()
+    replay = Replay(recorder.to_bytes())
+    assert replay.commands == [(0, Command.SHAKE, (0.2, 3.0))]
+
+
+def test_broken_files_are_replay_errors():
+    data = Recorder(Game(seed=1)).to_bytes()
+    for broken in (data[:HEADER.size + 3], data[:-2], data[:4] + bytes([2]) + data[5:]):
+        with pytest.raises(ReplayError):
+            Replay(broken)
@@ -0,0 +1,39 @@
+"""Saving and restoring whole game states."""
+import pytest
+
+from physics_tetris import Command, Game
+from physics_tetris.replay import state_checksum
+
+
+@pytest.mark.parametrize("options", [{}, {"freeze_after": 500}, {"use_numpy": True}])
+def test_restore_steps_on_identically(options, checksum_play):
+    if options.get("use_numpy"):
+        pytest.importorskip("numpy")
+    game = Game(seed=11, **options)
+    checksum_play(game, 1, 900)
+    snapshot = game.snapshot()
+    saved = state_checksum(game)
+    grid = [list(row) for row in game.grid]
+
+    game.restore(snapshot)
+    first = checksum_play(game, 2, 600)
+
+    # Wherever the game has got to since, restoring puts back the same state
+    # and the same inputs play out the same way
+    game.restore(snapshot)
+    assert state_checksum(game) == saved
+    assert [list(row) for row in game.grid] == grid
+    assert checksum_play(game, 2, 600) == first
+
+
+def test_restore_after_restart(checksum_play):
+    game = Game(seed=4, freeze_after=500)
+    checksum_play(game, 4, 700)
+    snapshot = game.snapshot()
+    game.restore(snapshot)
+    expected = checksum_play(game, 5, 300)
+
+    game.apply_command(Command.RESTART)
+    checksum_play(game, 6, 200)
+    game.restore(snapshot)
+    assert checksum_play(game, 5, 300) == expected
@@ -0,0 +1,39 @@
+"""Encoding a game for spectators and rebuilding it from the stream."""
+import pytest
+
+from physics_tetris import Game
+from physics_tetris.spectate import LENGTH, FrameEncoder, SpectatorView
+
+
+def check_view(view, game):
+    grid = game.grid.tolist() if hasattr(game.grid, "tolist") else game.grid
+    assert view.grid == [list(row) for row in grid]
+    assert len(view.blocks) == len(game.blocks)
+    assert (view.score, view.lines_cleared, view.level, view.game_over) == (
+        game.score, game.lines_cleared, game.level, game.game_over)
+    tetromino = game.current_tetromino
+    assert view.piece == (tetromino.type, tetromino.rotation, tetromino.grid_x, tetromino.grid_y)
+
+
+@pytest.mark.parametrize("options", [{}, {"freeze_after": 500}, {"use_numpy": True}])
+def test_view_follows_the_game(options, random_play):
+    if options.get("use_numpy"):
+        pytest.importorskip("numpy")
+    game = Game(seed=9, **options)
+    encoder = FrameEncoder()
+    view = SpectatorView()
+    late_view = SpectatorView()  # joins at frame 500
+    for frame, _ in enumerate(random_play(game, 9, 3000, frame_times=(16,)), 1):
+
+        keyframe = frame == 1 or frame % 1000 == 0
+        message = encoder.encode(game, frame, keyframe=keyframe)
+        (length,) = LENGTH.unpack_from(message)
+        assert length == len(message) - LENGTH.size
+        assert view.apply(message[LENGTH.size:])
+        if frame >= 500:
+            # Deltas are ignored until the first keyframe
+            assert late_view.apply(message[LENGTH.size:]) == (frame >= 1000)
+        assert view.frame == frame
+        check_view(view, game)
+    check_view(late_view, game)
+    assert view.blocks == late_view.blocks
@@ -0,0 +1,52 @@
+"""Stepping the game on its own thread and double-buffered frames."""
+import threading
+import time
+
+from physics_tetris import Command, Game
+from physics_tetris.threaded import FrameBuffers, SimulationThread
+
+
+def test_publish_swaps_unless_the_back_buffer_is_being_read():
+    game = Game(seed=1)
+    buffers = FrameBuffers()
+    first_front, first_back = buffers.front, buffers.back
+
+    assert buffers.publish(game)
+    assert buffers.front is first_back and buffers.back is first_front
+    assert buffers.front.source is game
+
+    # The renderer reads the front; the next publish fills the other buffer
+    frame = buffers.read()
+    assert buffers.publish(game)
+    assert buffers.back is frame
+
+    # Now the renderer holds what would be filled next, so publishing skips
+    game.apply_command(Command.HARD_DROP)
+    game.step()
+    assert not buffers.publish(game)
+    assert buffers.skipped == 1 and buffers.back is frame
+    assert len(frame.blocks) == 0  # untouched while read
+
+    buffers.release()
+    assert buffers.publish(game)
+    assert buffers.published == 3
+    assert len(buffers.front.blocks) == len(game.blocks) == 4
+
+
+def test_commands_from_another_thread_are_applied():
+    game = Game(seed=2)
+    game.fall_speed = float("inf")  # only the commands move the piece
+    with SimulationThread(game) as sim:
+        start_x = game.current_tetromino.grid_x
+        sender = threading.Thread(target=lambda: [sim.apply_command(Command.LEFT) for _ in range(2)])
+        sender.start()
+        sender.join()
+        deadline = time.monotonic() + 5
+        while sim.commands and time.monotonic() < deadline:
+            time.sleep(0.01)
+    # Stopping waits for the update that took them, and its publish
+    assert not sim.commands
+    assert game.current_tetromino.grid_x == start_x - 2
+    frame = sim.buffers.read()
+    assert frame.current_tetromino.grid_x == start_x - 2
+    sim.buffers.release()